@@ -0,0 +1,449 @@
+"""Benchmarks for bot.py against a fake Docker daemon and a fake Discord client.
+
+The fake Engine API runs in a separate process so its own work does not count
+against the bot. Every run uses the same seeded workload, so results saved with
+--json can be compared with --compare.
+
+    python bench/bench.py --containers 10,1000,5000
+    python bench/bench.py --json before.json
+    python bench/bench.py --compare before.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import re
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from aiohttp import web
+
+BOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot.py")
+LOG_LINE = "2024-05-01T12:00:00.000000000Z {level} request id={index} path=/api/v1/items/{item} status={status} latency_ms={latency} ts={ts:.6f}\n"
+
+
+# Fake Docker Engine API (runs in a child process)
+
+def log_line(index, ts=0.0):
+    error = index % 50 == 0
+    return LOG_LINE.format(level="ERROR" if error else "INFO", index=index, item=index % 997,
+                           status=500 if error else 200, latency=index % 500, ts=ts)
+
+
+def frame(data, stream=1):
+    """Multiplexed log frame as sent for non-TTY containers."""
+    return bytes([stream, 0, 0, 0]) + len(data).to_bytes(4, "big") + data
+
+
+class FakeDaemon:
+    """Serves N containers with a fixed response latency, log volume and follow rate."""
+
+    def __init__(self, count, latency, log_lines, follow_rate):
+        self.latency = latency
+        self.log_lines = log_lines
+        self.follow_rate = follow_rate
+        self.containers = {}
+        for index in range(count):
+            container_id = f"{index:012x}" + "0" * 52
+            self.containers[container_id] = {
+                "Id": container_id,
+                "Names": [f"/svc-{index:05d}"],
+                "Image": f"registry.local/app-{index % 20}:latest",
+                "State": "running" if index % 10 else "exited",
+                "Status": "Up 2 hours" if index % 10 else "Exited (1) 5 minutes ago",
+                "Labels": {"com.docker.compose.project": f"stack-{index % 8}"},
+            }
+        self.by_name = {entry["Names"][0][1:]: entry for entry in self.containers.values()}
+
+    def find(self, key):
+        return self.containers.get(key) or self.by_name.get(key)
+
+    async def respond(self, data):
+        await asyncio.sleep(self.latency)
+        return web.json_response(data)
+
+    async def container_list(self, request):
+        return await self.respond([*self.containers.values()])
+
+    async def inspect(self, request):
+        entry = self.find(request.match_info["name"])
+        if entry is None:
+            return web.json_response({"message": "No such container"}, status=404)
+        running = entry["State"] == "running"
+        return await self.respond({
+            "Id": entry["Id"],
+            "Name": entry["Names"][0],
+            "RestartCount": 0,
+            "Config": {"Image": entry["Image"], "Labels": entry["Labels"], "Tty": False},
+            "State": {"Status": entry["State"], "ExitCode": 0 if running else 1,
+                      "StartedAt": "2024-05-01T10:00:00.000000000Z", "FinishedAt": "0001-01-01T00:00:00Z"},
+        })
+
+    async def logs(self, request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        if request.query.get("follow") == "true":
+            # Emit lines in 10 ms ticks at the configured rate until the client goes away
+            index = 0
+            per_tick = max(self.follow_rate // 100, 1)
+            while True:
+                now = time.time()
+                chunk = b"".join(frame(log_line(index + offset, now).encode()) for offset in range(per_tick))
+                index += per_tick
+                try:
+                    await response.write(chunk)
+                except ConnectionError:
+                    return response
+                await asyncio.sleep(0.01)
+        chunk = []
+        for index in range(self.log_lines):
+            chunk.append(frame(log_line(index).encode()))
+            if len(chunk) == 512:
+                await response.write(b"".join(chunk))
+                chunk = []
+        await response.write(b"".join(chunk))
+        return response
+
+    async def events(self, request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        await asyncio.Event().wait()
+
+    async def system_df(self, request):
+        return await self.respond({"LayersSize": 0, "Images": [], "Containers": [], "Volumes": [], "BuildCache": []})
+
+    async def info(self, request):
+        return await self.respond({"MemTotal": 16 * 2 ** 30, "NCPU": 8})
+
+    def app(self):
+        app = web.Application()
+        prefix = "/{version}"
+        app.router.add_get(prefix + "/containers/json", self.container_list)
+        app.router.add_get(prefix + "/containers/{name}/json", self.inspect)
+        app.router.add_get(prefix + "/containers/{name}/logs", self.logs)
+        app.router.add_get(prefix + "/events", self.events)
+        app.router.add_get(prefix + "/system/df", self.system_df)
+        app.router.add_get(prefix + "/info", self.info)
+        return app
+
+
+def serve_daemon(port, count, latency, log_lines, follow_rate):
+    web.run_app(FakeDaemon(count, latency, log_lines, follow_rate).app(), host="127.0.0.1", port=port,
+                print=None, access_log=None, handle_signals=False)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.05)
+    raise RuntimeError(f"fake daemon did not start on port {port}")
+
+
+# Fake Discord objects
+
+class FakeMessage:
+    def __init__(self, channel, payload):
+        self.channel = channel
+        self.id = len(channel.sent)
+        self.payload = payload
+
+    async def edit(self, **payload):
+        self.channel.edits += 1
+
+    async def pin(self):
+        pass
+
+
+class FakeChannel:
+    """Records every message; log lines carrying ts= stamps are timed end to end."""
+
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.name = f"bench-{channel_id}"
+        self.sent = []
+        self.edits = 0
+        self.delivery = []  # Seconds from the daemon emitting a followed line to its message being sent
+        self.lines = 0
+
+    async def send(self, content=None, **payload):
+        now = time.time()
+        if content:
+            stamps = re.findall(r"ts=(\d+\.\d+)", content)
+            self.lines += len(stamps)
+            self.delivery.extend(now - float(stamp) for stamp in stamps)
+        message = FakeMessage(self, dict(payload, content=content))
+        self.sent.append(len(content or ""))
+        return message
+
+
+class FakeAuthor:
+    id = 1
+    name = "bench"
+
+
+class FakeContext:
+    """Stands in for ApplicationContext: records responses instead of calling Discord."""
+
+    def __init__(self, channel, user_id=1):
+        self.author = FakeAuthor()
+        self.author.id = user_id
+        self.channel = channel
+        self.responses = []
+
+    async def defer(self, **kwargs):
+        pass
+
+    async def respond(self, *args, **kwargs):
+        self.responses.append((args, kwargs))
+        return FakeMessage(self.channel, kwargs)
+
+
+class FakeAutocomplete:
+    def __init__(self, value):
+        self.value = value
+
+
+# Harness
+
+def load_bot(workdir, port, name):
+    """Import a fresh copy of bot.py configured against the fake daemon."""
+    os.makedirs(os.path.join(workdir, "config"), exist_ok=True)
+    settings = {
+        "token": "bench", "bot_name": "Bench", "timezone_offset": 0, "status": {"type": "watching", "message": "bench"},
+        "allowed_user_ids": [*range(1, 100)], "admins": [1], "devs": [],
+        "alert_channel_id": 999, "docker_host": f"tcp://127.0.0.1:{port}",
+        "audit_db_file": os.path.join(workdir, "audit.db"),
+    }
+    with open(os.path.join(workdir, "config", "config.json"), "w") as file:
+        json.dump(settings, file)
+    os.chdir(workdir)
+    spec = importlib.util.spec_from_file_location(name, BOT_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def summarize(latencies):
+    if not latencies:
+        return {"p50_ms": None, "p99_ms": None}
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+    }
+
+
+async def bench_autocomplete(bot, args, iterations):
+    queries = ["", "s", "svc-0", "svc-01", "svc-004", "99", "stk", "x"]
+    latencies = []
+    for index in range(iterations):
+        started = time.perf_counter()
+        await bot.get_container_names(FakeAutocomplete(queries[index % len(queries)]))
+        latencies.append(time.perf_counter() - started)
+    return latencies, 0
+
+
+async def bench_list(bot, args, iterations):
+    channel = FakeChannel(1)
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await bot.list.callback(FakeContext(channel))
+        latencies.append(time.perf_counter() - started)
+    return latencies, iterations
+
+
+async def bench_logs(bot, args, iterations):
+    channel = FakeChannel(1)
+    name = bot.inventory.sorted_names[0]
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await bot.logs.callback(FakeContext(channel), name, "1h", "ERROR", False, None)
+        latencies.append(time.perf_counter() - started)
+    return latencies, iterations
+
+
+async def bench_follow(bot, args, seconds):
+    """Several users in separate channels follow one container for a while."""
+    name = bot.inventory.sorted_names[1]
+    channels = [FakeChannel(100 + index) for index in range(args.followers)]
+    for index, channel in enumerate(channels):
+        await bot.follow.callback(FakeContext(channel, user_id=10 + index), name)
+    await asyncio.sleep(seconds)
+    for index, channel in enumerate(channels):
+        await bot.stop.callback(FakeContext(channel, user_id=10 + index))
+    latencies = [delay for channel in channels for delay in channel.delivery]
+    return latencies, sum(len(channel.sent) for channel in channels)
+
+
+async def bench_alert_cycle(bot, args, cycles):
+    """Publish stats batches for every running container through alert_monitor and metrics_recorder."""
+    channel = FakeChannel(999)
+    bot.bot.get_channel = lambda channel_id: channel
+
+    async def ready():
+        pass
+
+    bot.bot.wait_until_ready = ready
+    rng = random.Random(7)
+    running = [entry for entry in bot.inventory.containers.values() if entry["status"] == "running"]
+    tasks = [asyncio.create_task(bot.alert_monitor()), asyncio.create_task(bot.metrics_recorder())]
+    await asyncio.sleep(0)
+    queues = bot.stats_collector.subscribers[-2:]
+    latencies = []
+    for cycle in range(cycles):
+        now = time.time()
+        bot.stats_collector.latest = {
+            entry["id"]: {
+                "timestamp": now + cycle, "cpu_percent": rng.uniform(70, 90) if rng.random() < 0.02 else rng.uniform(0, 30),
+                "mem_usage": rng.randint(50, 500) * 2 ** 20, "mem_limit": 2 ** 31, "mem_percent": rng.uniform(1, 25),
+                "net_rx": cycle * 1000, "net_tx": cycle * 1000, "blk_read": 0, "blk_write": 0,
+            }
+            for entry in running
+        }
+        started = time.perf_counter()
+        bot.stats_collector.publish()
+        while any(not queue.empty() for queue in queues):
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        latencies.append(time.perf_counter() - started)
+    await asyncio.sleep(0.1)
+    for task in tasks:
+        task.cancel()
+    queue = bot.outbound.queues.get(channel.id)
+    return latencies, len(channel.sent) + (queue.depth() if queue else 0)
+
+
+SCENARIOS = {
+    "autocomplete": (bench_autocomplete, "iterations"),
+    "list": (bench_list, "iterations"),
+    "logs": (bench_logs, "log_iterations"),
+    "follow": (bench_follow, "follow_seconds"),
+    "alert_cycle": (bench_alert_cycle, "cycles"),
+}
+
+
+async def run_size(bot, args):
+    results = {}
+    started = time.perf_counter()
+    await bot.inventory.resync()
+    results["inventory_resync"] = {"p50_ms": round((time.perf_counter() - started) * 1000, 3), "p99_ms": None,
+                                   "peak_kib": None, "messages": 0, "samples": 1}
+    for name in args.scenarios:
+        scenario, amount = SCENARIOS[name]
+        latencies, messages = await scenario(bot, args, getattr(args, amount))
+        # A second, short pass under tracemalloc so tracing does not skew the latencies above
+        tracemalloc.start()
+        await scenario(bot, args, 1)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = dict(summarize(latencies), peak_kib=round(peak / 1024), messages=messages, samples=len(latencies))
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await bot.docker.close()
+    return results
+
+
+def run_benchmarks(args):
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    origin = os.getcwd()
+    for count in args.containers:
+        port = free_port()
+        daemon = context.Process(target=serve_daemon, args=(port, count, args.latency / 1000, args.log_lines, args.follow_rate), daemon=True)
+        daemon.start()
+        try:
+            wait_for_port(port)
+            # discord.Bot binds to the current event loop when it is created
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            with tempfile.TemporaryDirectory() as workdir:
+                try:
+                    bot = load_bot(workdir, port, f"bench_bot_{count}")
+                    results[str(count)] = loop.run_until_complete(run_size(bot, args))
+                finally:
+                    os.chdir(origin)
+                    loop.close()
+                    asyncio.set_event_loop(None)
+        finally:
+            daemon.terminate()
+            daemon.join()
+    return results
+
+
+def print_results(results, baseline=None):
+    header = f"{'containers':>10}  {'scenario':<16}{'p50 ms':>10}{'p99 ms':>10}{'peak KiB':>10}{'messages':>10}"
+    print(header)
+    print("-" * len(header))
+    for count, scenarios in results.items():
+        for name, result in scenarios.items():
+            row = f"{count:>10}  {name:<16}"
+            for key, width in (("p50_ms", 10), ("p99_ms", 10), ("peak_kib", 10), ("messages", 10)):
+                value = result[key]
+                row += f"{'-' if value is None else value:>{width}}"
+            previous = (baseline or {}).get(count, {}).get(name)
+            if previous:
+                changes = []
+                for key in ("p50_ms", "p99_ms", "peak_kib"):
+                    if result[key] is not None and previous.get(key):
+                        changes.append(f"{key.split('_')[0]} {(result[key] - previous[key]) / previous[key] * 100:+.1f}%")
+                row += "  (" + ", ".join(changes) + ")" if changes else ""
+            print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bot.py against a fake Docker daemon.")
+    parser.add_argument("--containers", default="10,1000,5000", help="Comma-separated container counts")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--latency", type=float, default=1.0, help="Fake daemon response latency in ms")
+    parser.add_argument("--log-lines", type=int, default=200000, help="Lines returned by the /logs scenario")
+    parser.add_argument("--follow-rate", type=int, default=2000, help="Lines per second emitted to /follow")
+    parser.add_argument("--followers", type=int, default=3, help="Users following the same container")
+    parser.add_argument("--iterations", type=int, default=200, help="Autocomplete and /list invocations")
+    parser.add_argument("--log-iterations", type=int, default=5, help="/logs invocations")
+    parser.add_argument("--follow-seconds", type=int, default=10, help="How long the /follow scenario runs")
+    parser.add_argument("--cycles", type=int, default=50, help="Stats batches in the alert cycle scenario")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Show changes relative to results saved with --json")
+    args = parser.parse_args()
+    args.containers = [int(count) for count in args.containers.split(",")]
+    args.scenarios = [name.strip() for name in args.scenarios.split(",")]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+
+    results = run_benchmarks(args)
+    print_results(results, baseline)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"settings": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+                       "python": sys.version.split()[0], "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,192 @@
 import discord
+import aiohttp
+import io
+from aiohttp import web
 import subprocess
 import socket
+import ssl
 import platform
 import json
+import logging
 import asyncio
-from datetime import datetime, timedelta, timezone
+import contextlib
+import fnmatch
+import glob
+import gzip
+import hashlib
+import operator
+import os
+import re
 import shlex
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from array import array
+from bisect import bisect_left
+from collections import deque
+from itertools import compress
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, unquote, urlsplit
+
+PROCESS_STARTED = time.monotonic()  # Time-to-ready is measured from here
+PROCESS_STARTED_AT = time.time()
+
+# Commands are only synced when their definitions change (see sync_profile), not on every gateway connect
+bot = discord.Bot(auto_sync_commands=False)
 
-bot = discord.Bot()
+CONFIG_FILE = "config/config.json"
 
 # Load configuration
-with open("config/config.json", "r") as config_file:
+with open(CONFIG_FILE, "r") as config_file:
     config = json.load(config_file)
 
 # Constants
-ALERT_THRESHOLD = 50  # Alert when CPU or RAM usage exceeds 50%
+ALERT_THRESHOLD = 50  # CPU % of the default rule used when no alert_rules are configured
 ALERT_CHANNEL_ID = config.get("alert_channel_id", None)
-alerted_containers = {}  # Track container alerts
-AUDIT_LOG_FILE = "audit_log.json"  # File to store audit logs
+EVENT_HISTORY = config.get("event_history", 256)  # Container events kept in memory per container for /events
+CRASH_LOOP = config.get("crash_loop", {"count": 5, "window": 300})  # Alert when a container dies `count` times within `window` seconds
+HEALTH_FLAPPING = config.get("health_flapping", {"count": 4, "window": 600})  # Same, for health status changes
+AUDIT_LOG_FILE = "audit_log.json"  # Legacy JSON-lines audit log, imported into the database once
+AUDIT_DB_FILE = config.get("audit_db_file", "config/audit_log.db")  # SQLite audit store
+AUDIT_RETENTION_DAYS = config.get("audit_retention_days", 180)  # Older audit rows are rotated out
+AUDIT_PAGE_SIZE = 10
+DOCKER_HOST = config.get("docker_host", "unix:///var/run/docker.sock")  # unix:// socket or tcp://host:port
+DOCKER_API_VERSION = config.get("docker_api_version", "v1.41")
+DOCKER_HOSTS = config.get("docker_hosts") or {"local": DOCKER_HOST}  # Host name -> endpoint URL or {"url", "tls"}
+FLEET_MODE = len(DOCKER_HOSTS) > 1  # Container names are qualified as host/container when managing several hosts
+HOST_TIMEOUT = config.get("host_timeout", 5)  # Seconds to connect to (or wait on) one host before giving up on it
+STATS_INTERVAL = min(max(config.get("stats_interval", 2), 1), 5)  # Seconds between published stats samples (1-5)
+METRICS_BACKEND = config.get("metrics_backend", "api")  # "api" (Engine API stats streams) or "cgroup"
+CGROUP_ROOT = config.get("cgroup_root", "/sys/fs/cgroup")
+SERIES_METRICS = ("cpu", "mem", "net_rx", "net_tx", "blk_read", "blk_write")  # Stored per container
+SERIES_TIERS = ((1, 300), (60, 360), (3600, 168))  # (resolution seconds, slots): 5 min, 6 h and 7 days
+MAX_SERIES = 1000  # Containers with history kept; least recently updated are evicted first
+MAX_MESSAGE_LENGTH = 1900  # Leave some room for the code block formatting
+OUTBOUND_LOG_BACKLOG = config.get("outbound_log_backlog", 2000)  # Queued log lines per channel before the oldest are dropped
+FOLLOW_FLUSH_INTERVAL = config.get("follow_flush_interval", 2.0)  # Seconds between /follow batches
+LOGS_MAX_LINES = config.get("logs_max_lines", 200000)  # Matching lines written to a /logs attachment
+LOG_ARCHIVE = config.get("log_archive")  # Archive live logs of selected containers to disk for /logs search; off when unset
+LOG_ANALYSIS = config.get("log_analysis")  # Continuous template mining and spike alerts for selected containers; off when unset
+LOGS_MAX_ATTACHMENT = 8 * 1024 * 1024  # Compressed attachment size cap (Discord upload limit)
+LOGS_PREVIEW_LINES = 15
+QUERY_CACHE_TTL = config.get("query_cache_ttl", {"images": 5})  # Seconds a read-only query result is reused, per command
+DISK_USAGE_MAX_AGE = config.get("disk_usage_max_age", 300)  # Seconds before cached disk usage is refreshed in the background
+MAX_CONCURRENT_OPERATIONS = config.get("max_concurrent_operations", 4)  # Mutating Docker operations running at once across all users
+MAX_OPERATIONS_PER_USER = config.get("max_operations_per_user", 1)  # Mutating Docker operations one user may have in flight
+BULK_PARALLELISM = config.get("bulk_parallelism", 5)  # Containers acted on at once by /docker bulk
+BULK_EDIT_INTERVAL = 1.5  # Seconds between /docker bulk progress edits
+MAX_CONCURRENT_PULLS = config.get("max_concurrent_pulls", 3)  # Image pulls running at once per host; the rest queue
+PULL_EDIT_INTERVAL = 2  # Seconds between /docker images pull progress edits
+STARTUP_STATE_FILE = "config/startup_state.json"  # Hashes of what was last pushed to Discord (avatar, commands)
+DASHBOARD_FILE = "config/dashboards.json"  # Channel id -> pinned dashboard message id, kept across restarts
+DASHBOARD_INTERVAL = max(config.get("dashboard_interval", 10), 5)  # Minimum seconds between edits of one dashboard
+DASHBOARD_ROWS = 40  # Containers listed on a dashboard; the rest are summarized
+METRICS_PORT = config.get("metrics_port")  # Serve Prometheus metrics on this port; disabled when unset
+METRICS_HOST = config.get("metrics_host", "127.0.0.1")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LOOP_LAG_INTERVAL = 0.5  # Seconds between event loop lag probes
+LOOP_LAG_THRESHOLD = config.get("loop_lag_threshold", 1.0)  # Seconds the loop may stall before the blocking stack is logged
+PROFILE_MAX_SECONDS = 120
+PROFILE_SAMPLE_INTERVAL = 0.005  # Seconds between /profile stack samples
+
+class Authorization:
+    """In-memory roles from config.json with set lookups, mtime-based hot reload and atomic writes."""
+
+    def __init__(self, path=CONFIG_FILE, poll_interval=2.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.lock = asyncio.Lock()  # Serializes role edits
+        self.mtime = None
+        self.task = None
+        self._apply(config, os.stat(path).st_mtime_ns)
+
+    def _apply(self, data, mtime):
+        self.admins = set(data.get("admins", []))
+        self.devs = set(data.get("devs", []))
+        self.allowed = set(data.get("allowed_user_ids", []))
+        self.mtime = mtime
+
+    def _read(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path, "r") as file:
+            return json.load(file), mtime
+
+    def _write(self, data):
+        # Write to a temp file in the same directory and rename over the original, so readers never see a partial file
+        directory = os.path.dirname(self.path) or "."
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".config-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(data, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(temp_path)
+            raise
+        return os.stat(self.path).st_mtime_ns
+
+    async def watch(self):
+        """Reload roles whenever config.json changes on disk."""
+        while not bot.is_closed():
+            await asyncio.sleep(self.poll_interval)
+            try:
+                if os.stat(self.path).st_mtime_ns != self.mtime:
+                    async with self.lock:
+                        self._apply(*await asyncio.to_thread(self._read))
+                    print("✅ Reloaded roles from config.json")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Error reloading config.json: {e}")
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = bot.loop.create_task(self.watch())
+
+    def is_allowed(self, user_id):
+        return user_id in self.allowed
+
+    def is_admin(self, user_id):
+        return user_id in self.admins
+
+    def role_of(self, user_id):
+        if user_id in self.admins:
+            return "admin"
+        if user_id in self.devs:
+            return "dev"
+        return None
+
+    async def update_role(self, action, role, user_id):
+        """Add or remove a user from a role; returns False if nothing changed."""
+        key = "admins" if role == "admin" else "devs"
+        async with self.lock:
+            # Re-read under the lock so edits made to the file by hand are not lost
+            data, mtime = await asyncio.to_thread(self._read)
+            members = data.setdefault(key, [])
+            if (user_id in members) == (action == "add"):
+                self._apply(data, mtime)
+                return False
+            if action == "add":
+                members.append(user_id)
+            else:
+                members.remove(user_id)
+            self._apply(data, await asyncio.to_thread(self._write, data))
+            return True
+
+
+authorization = Authorization()
 
 async def check_permissions(ctx, required_role="dev"):
     """Check if the user has the required role."""
-    user_id = ctx.author.id
-
-    # Load latest roles
-    with open("config/config.json", "r") as file:
-        config = json.load(file)
+    role = authorization.role_of(ctx.author.id)
 
-    if user_id in config["admins"]:  # Full access for Admins
+    if role == "admin":  # Full access for Admins
         return "admin"
-    elif required_role == "dev" and user_id in config["devs"]:  # Devs can read
+    elif required_role == "dev" and role == "dev":  # Devs can read
         return "dev"
 
     await ctx.respond("❌ You do not have permission to use this command.", ephemeral=True)
@@ -41,28 +198,157 @@ def get_current_time():
     return current_time
 
 async def get_container_names(ctx: discord.AutocompleteContext):
-    try:
-        result = subprocess.check_output(['docker', 'ps', '--all', '--format', '{{.Names}}'], text=True)
-        container_names = result.strip().split('\n')
-        return [name for name in container_names if name] or ["No containers available"]
-    except subprocess.CalledProcessError:
+    if not inventory.ready.is_set():
         return ["Error retrieving containers"]
+    return inventory.search(ctx.value) or ["No containers available"]
+
+class AuditStore:
+    """SQLite-backed command audit log with a timestamp index and buffered group-commit writes.
+
+    Commands are appended to an in-memory buffer and written in one transaction per
+    flush, off the event loop. Queries page backwards by row id, so each page costs
+    time proportional to the rows it returns.
+    """
+
+    def __init__(self, path=AUDIT_DB_FILE, flush_interval=1.0, batch_size=200, retention_days=AUDIT_RETENTION_DAYS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+        self.pending = []
+        self.connection = None
+        self.lock = asyncio.Lock()
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    def _open(self):
+        # The database used to live in the working directory, outside the persisted config/ volume
+        if self.path == AUDIT_DB_FILE and not os.path.exists(self.path) and os.path.exists("audit_log.db"):
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists("audit_log.db" + suffix):
+                    shutil.move("audit_log.db" + suffix, self.path + suffix)
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS commands ("
+            "id INTEGER PRIMARY KEY, timestamp REAL NOT NULL, user_id INTEGER, username TEXT, command TEXT, args TEXT)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS commands_timestamp ON commands (timestamp)")
+        # One-time import of the old JSON-lines log so history is not lost
+        if os.path.exists(AUDIT_LOG_FILE) and not connection.execute("SELECT 1 FROM commands LIMIT 1").fetchone():
+            with open(AUDIT_LOG_FILE) as log_file:
+                rows = []
+                for number, line in enumerate(log_file, 1):
+                    try:
+                        entry = json.loads(line)
+                        rows.append((datetime.fromisoformat(entry["timestamp"]).timestamp(), entry["user_id"], entry["username"],
+                                     entry["command"], json.dumps(entry["args"])))
+                    except (ValueError, KeyError, TypeError) as e:
+                        # A torn or hand-edited line must not stop the import (and with it the writer)
+                        print(f"⚠️ Skipping unreadable line {number} of {AUDIT_LOG_FILE}: {e}")
+            rows.sort()
+            connection.executemany("INSERT INTO commands (timestamp, user_id, username, command, args) VALUES (?, ?, ?, ?, ?)", rows)
+        connection.commit()
+        return connection
+
+    async def _run(self, function, *args):
+        """Run a database call in a worker thread, one at a time."""
+        async with self.lock:
+            if self.connection is None:
+                self.connection = await asyncio.to_thread(self._open)
+            return await asyncio.to_thread(function, *args)
+
+    def append(self, entry):
+        self.pending.append(entry)
+        if len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+
+    def _write(self, rows):
+        with self.connection:
+            self.connection.executemany("INSERT INTO commands (timestamp, user_id, username, command, args) VALUES (?, ?, ?, ?, ?)", rows)
+
+    async def flush(self):
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, []
+        try:
+            await self._run(self._write, rows)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error writing to audit log: {e}")
+
+    def _rotate(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM commands WHERE timestamp < ?", (time.time() - self.retention_days * 86400,))
+
+    async def writer(self):
+        last_rotation = 0.0
+        while not bot.is_closed():
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self.wakeup.wait(), self.flush_interval)
+            self.wakeup.clear()
+            await self.flush()
+            if time.monotonic() - last_rotation > 3600:
+                last_rotation = time.monotonic()
+                with contextlib.suppress(sqlite3.Error):
+                    await self._run(self._rotate)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = bot.loop.create_task(self.writer())
+
+    def close(self):
+        """Write the rows still buffered and close the database; called after the event loop has stopped."""
+        rows, self.pending = self.pending, []
+        try:
+            if rows:
+                if self.connection is None:
+                    self.connection = self._open()
+                self._write(rows)
+            if self.connection is not None:
+                self.connection.close()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error writing to audit log: {e}")
+
+    def _first_id(self, since):
+        """Row id of the oldest entry at or after `since`, found through the timestamp index."""
+        row = self.connection.execute(
+            "SELECT id FROM commands WHERE timestamp >= ? ORDER BY timestamp LIMIT 1", (since,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _page(self, since, before_id, limit):
+        # Rows are appended in time order, so the window is a row id range and paging
+        # walks the primary key instead of filtering every older row by timestamp
+        first_id = self._first_id(since)
+        if first_id is None:
+            return []
+        cursor = self.connection.execute(
+            "SELECT id, timestamp, user_id, username, command, args FROM commands "
+            "WHERE id >= ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (first_id, before_id, limit),
+        )
+        return cursor.fetchall()
 
-def log_command(user_id, username, command, args):
-    """Log command execution to a file."""
-    log_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "user_id": user_id,
-        "username": username,
-        "command": command,
-        "args": args
-    }
+    def _count(self, since):
+        # Counted from the covering timestamp index, touching only the rows in the window
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM commands INDEXED BY commands_timestamp WHERE timestamp >= ?", (since,)
+        ).fetchone()[0]
 
-    try:
-        with open(AUDIT_LOG_FILE, "a") as log_file:
-            log_file.write(json.dumps(log_entry) + "\n")
-    except Exception as e:
-        print(f"Error writing to audit log: {e}")
+    async def page(self, since, before_id=None, limit=AUDIT_PAGE_SIZE):
+        """Newest-first entries since `since`, older than row `before_id`."""
+        await self.flush()
+        return await self._run(self._page, since, before_id if before_id is not None else 2 ** 63 - 1, limit)
+
+    async def count(self, since):
+        return await self._run(self._count, since)
+
+
+audit_store = AuditStore()
+
+def log_command(user_id, username, command, args):
+    """Queue a command execution for the audit log."""
+    audit_store.append((time.time(), user_id, username, command, json.dumps(args)))
         
 def log_role_change(action, role, user_id, admin_id):
     """Log user role changes."""
@@ -79,57 +365,2437 @@ def log_role_change(action, role, user_id, admin_id):
     except Exception as e:
         print(f"⚠️ Error logging role change: {e}")
 
+def format_bytes(size):
+    """Format a byte count the way the Docker CLI does (1000-based units)."""
+    for unit in ["B", "kB", "MB", "GB", "TB"]:
+        if abs(size) < 1000 or unit == "TB":
+            return f"{size:.4g}{unit}"
+        size /= 1000
+
+def format_binary_bytes(size):
+    """Format a byte count in 1024-based units, as used by `docker stats`."""
+    for unit in ["B", "KiB", "MiB", "GiB", "TiB"]:
+        if abs(size) < 1024 or unit == "TiB":
+            return f"{size:.4g}{unit}"
+        size /= 1024
+
+def parse_memory(value):
+    """Convert a memory limit such as `512m` or `1g` to bytes."""
+    units = {"b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    value = value.strip().lower()
+    if value.isdigit():
+        return int(value)
+    return int(float(value[:-1]) * units[value[-1]])
+
+def parse_since(timeframe):
+    """Convert a `10m`/`2h` timeframe into the unix timestamp the Engine API expects."""
+    seconds = int(timeframe[:-1]) * (3600 if timeframe.endswith("h") else 60)
+    return int(time.time()) - seconds
+
+def split_image_ref(image):
+    """Split `repo[:tag]` into (repo, tag), defaulting to `latest` so a pull never fetches every tag."""
+    if "@" in image:
+        return image, None
+    repo, _, tag = image.rpartition(":")
+    if not repo or "/" in tag:
+        return image, "latest"
+    return repo, tag
+
+def compile_log_filter(search, regex=False):
+    """Build a line predicate from a /logs search.
+
+    With `regex` the search is one case-insensitive pattern; otherwise it is a list of
+    terms (quote phrases) that must all appear, where `-term` excludes lines.
+    """
+    if not search or not search.strip():
+        return None
+    if regex:
+        return re.compile(search, re.IGNORECASE).search
+    include, exclude = [], []
+    for term in shlex.split(search):
+        if term.startswith("-") and len(term) > 1:
+            exclude.append(re.compile(re.escape(term[1:]), re.IGNORECASE).search)
+        else:
+            include.append(re.compile(re.escape(term), re.IGNORECASE).search)
+    if len(include) == 1 and not exclude:
+        return include[0]
+    return lambda line: all(match(line) for match in include) and not any(match(line) for match in exclude)
+
+LOGFMT_PAIR = re.compile(r'([\w.@/-]+)=("(?:[^"\\]|\\.)*"|\S*)')
+LOG_LEVELS = {"trace": 0, "debug": 1, "info": 2, "notice": 2, "warn": 3, "warning": 3, "error": 4, "err": 4,
+              "critical": 5, "crit": 5, "fatal": 5, "panic": 5}
+FILTER_CLAUSE = re.compile(r"^([\w.@/-]+)(>=|<=|!=|=|>|<)(.*)$")
+
+def parse_structured(line):
+    """Parse a JSON object or logfmt line into a flat dict (nested keys joined with dots), else None."""
+    text = line.lstrip()
+    if text.startswith("{"):
+        try:
+            record = json.loads(text)
+        except ValueError:
+            return None
+        if not isinstance(record, dict):
+            return None
+        flat, stack = {}, [("", record)]
+        while stack:
+            prefix, value = stack.pop()
+            for key, item in value.items():
+                if isinstance(item, dict):
+                    stack.append((f"{prefix}{key}.", item))
+                else:
+                    flat[prefix + key] = item
+        return flat
+    pairs = LOGFMT_PAIR.findall(text)
+    if len(pairs) < 2:
+        return None
+    return {key: value[1:-1].replace('\\"', '"') if value.startswith('"') else value for key, value in pairs}
+
+def compile_field_filter(where):
+    """Compile `level>=warn route=/api/* latency_ms>500` into a predicate over parsed records.
+
+    Clauses are separated by spaces and must all hold. `=`/`!=` accept `*` globs;
+    `<`, `>`, `<=`, `>=` compare numbers, or log levels when the field is a level.
+    """
+    clauses = []
+    for clause in shlex.split(where):
+        parsed = FILTER_CLAUSE.match(clause)
+        if not parsed:
+            raise ValueError(f"cannot parse `{clause}`, expected field<op>value")
+        field, op, expected = parsed.groups()
+        if op in ("=", "!="):
+            if "*" in expected:
+                pattern = re.compile(fnmatch.translate(expected), re.IGNORECASE).match
+                test = lambda value, pattern=pattern: value is not None and pattern(str(value)) is not None
+            else:
+                test = lambda value, expected=expected.lower(): value is not None and str(value).lower() == expected
+            clauses.append((field, test) if op == "=" else (field, lambda value, test=test: not test(value)))
+            continue
+        compare = {">": operator.gt, "<": operator.lt, ">=": operator.ge, "<=": operator.le}[op]
+        if expected.lower() in LOG_LEVELS:
+            rank = LOG_LEVELS[expected.lower()]
+            test = lambda value, rank=rank, compare=compare: str(value).lower() in LOG_LEVELS and compare(LOG_LEVELS[str(value).lower()], rank)
+        else:
+            try:
+                number = float(expected)
+            except ValueError:
+                raise ValueError(f"`{clause}` needs a number or a log level") from None
 
-@bot.event
-async def on_connect():
-    try:
-        await bot.sync_commands()
-    except discord.errors.Forbidden as e:
-        print("\n⚠️  Warning: Could not sync commands - Missing permissions")
-        print("\nTo fix this, please:")
-        print("1. Remove the bot from your server")
-        print(f"2. Reinvite using this link: https://discord.com/api/oauth2/authorize?client_id={bot.user.id}&permissions=2147483648&scope=bot%20applications.commands")
-        print("\nThe bot will continue to run, but slash commands may not work properly until this is fixed.\n")
-    except Exception as e:
-        print(f"\n⚠️  Error syncing commands: {e}\n")
+            def test(value, number=number, compare=compare):
+                try:
+                    return compare(float(value), number)
+                except (TypeError, ValueError):
+                    return False
+        clauses.append((field, test))
+    return lambda record: all(test(record.get(field)) for field, test in clauses)
+
+def compile_structured_view(where=None, fields=None):
+    """Build the per-line transform for `where`/`fields`: returns the line to show, or None to drop it.
+
+    Lines are parsed once. With a filter, lines that are not JSON or logfmt are dropped;
+    with a projection, only the named fields are kept, as compact `key=value` pairs.
+    """
+    if not (where and where.strip()) and not (fields and fields.strip()):
+        return None
+    matches = compile_field_filter(where) if where and where.strip() else None
+    keys = [key for key in re.split(r"[\s,]+", fields.strip()) if key] if fields and fields.strip() else None
+
+    def transform(line):
+        record = parse_structured(line)
+        if record is None:
+            return None if matches else line
+        if matches and not matches(record):
+            return None
+        if not keys:
+            return line
+        parts = []
+        for key in keys:
+            value = record.get(key)
+            if value is None:
+                continue
+            value = value if isinstance(value, str) else json.dumps(value)
+            parts.append(f'{key}={json.dumps(value) if not value or " " in value or "=" in value else value}')
+        return " ".join(parts) or None
+    return transform
+
+def calculate_stats(raw, previous=None):
+    """Derive CPU %, memory and IO figures from an Engine API stats payload.
+
+    CPU % is measured against `previous` (an earlier payload) when given, otherwise
+    against the daemon's own precpu_stats.
+    """
+    cpu = raw.get("cpu_stats", {})
+    precpu = previous.get("cpu_stats", {}) if previous else raw.get("precpu_stats", {})
+    cpu_delta = cpu.get("cpu_usage", {}).get("total_usage", 0) - precpu.get("cpu_usage", {}).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+    online_cpus = cpu.get("online_cpus") or len(cpu.get("cpu_usage", {}).get("percpu_usage") or []) or 1
+    cpu_percent = cpu_delta / system_delta * online_cpus * 100 if system_delta > 0 and cpu_delta > 0 else 0.0
+
+    memory = raw.get("memory_stats", {})
+    mem_stats = memory.get("stats", {})
+    # Match the CLI: page cache is not counted as usage
+    cache = mem_stats.get("inactive_file", mem_stats.get("total_inactive_file", 0))
+    mem_usage = max(memory.get("usage", 0) - cache, 0)
+    mem_limit = memory.get("limit", 0)
+
+    networks = raw.get("networks") or {}
+    blkio = (raw.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+    return {
+        "cpu_percent": cpu_percent,
+        "mem_usage": mem_usage,
+        "mem_limit": mem_limit,
+        "mem_percent": mem_usage / mem_limit * 100 if mem_limit else 0.0,
+        "net_rx": sum(net.get("rx_bytes", 0) for net in networks.values()),
+        "net_tx": sum(net.get("tx_bytes", 0) for net in networks.values()),
+        "blk_read": sum(entry["value"] for entry in blkio if entry.get("op", "").lower() == "read"),
+        "blk_write": sum(entry["value"] for entry in blkio if entry.get("op", "").lower() == "write"),
+    }
 
-@bot.event
-async def on_ready():
+def format_system_df(df):
+    """Render a /system/df payload as the table printed by `docker system df`."""
+    images = df.get("Images") or []
+    containers = df.get("Containers") or []
+    volumes = df.get("Volumes") or []
+    build_cache = df.get("BuildCache") or []
+
+    image_reclaimable = sum(image["Size"] - max(image.get("SharedSize", 0), 0) for image in images if not image.get("Containers"))
+    container_size = sum(c.get("SizeRw", 0) for c in containers)
+    container_reclaimable = sum(c.get("SizeRw", 0) for c in containers if c.get("State") != "running")
+    volume_sizes = [(v["UsageData"]["Size"], v["UsageData"]["RefCount"]) for v in volumes if v.get("UsageData") and v["UsageData"]["Size"] >= 0]
+    cache_size = sum(entry.get("Size", 0) for entry in build_cache)
+    cache_reclaimable = sum(entry.get("Size", 0) for entry in build_cache if not entry.get("InUse") and not entry.get("Shared"))
+
+    rows = [
+        ("Images", len(images), sum(1 for image in images if image.get("Containers")), df.get("LayersSize", 0), image_reclaimable),
+        ("Containers", len(containers), sum(1 for c in containers if c.get("State") == "running"), container_size, container_reclaimable),
+        ("Local Volumes", len(volumes), sum(1 for size, refs in volume_sizes if refs), sum(size for size, _ in volume_sizes), sum(size for size, refs in volume_sizes if not refs)),
+        ("Build Cache", len(build_cache), sum(1 for entry in build_cache if entry.get("InUse")), cache_size, cache_reclaimable),
+    ]
+    lines = [f"{'TYPE':<15}{'TOTAL':<8}{'ACTIVE':<8}{'SIZE':<11}RECLAIMABLE"]
+    for kind, total, active, size, reclaimable in rows:
+        lines.append(f"{kind:<15}{total:<8}{active:<8}{format_bytes(size):<11}{format_bytes(reclaimable)}")
+    return "\n".join(lines)
+
+
+def format_labels(names, values):
+    """Render a Prometheus label set, escaping values as the text format requires."""
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Histogram:
+    """Prometheus histogram with fixed buckets, one series per label value tuple."""
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        bounds = [*map(str, self.buckets), "+Inf"]
+        for values, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                yield f"{self.name}_bucket{format_labels((*self.labels, 'le'), (*values, bound))} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labels, values)} {series[-1]}"
+            yield f"{self.name}_count{format_labels(self.labels, values)} {cumulative}"
+
+
+class Counter:
+    """Prometheus counter, one value per label value tuple."""
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for values, value in self.values.items():
+            yield f"{self.name}_total{format_labels(self.labels, values)} {value}"
+
+
+command_latency = Histogram("guardian_command_duration_seconds", "Slash command handling time.", ("command", "outcome"))
+docker_latency = Histogram("guardian_docker_request_duration_seconds", "Docker Engine API request time.", ("operation",))
+docker_errors = Counter("guardian_docker_errors", "Docker Engine API requests that failed.", ("operation",))
+loop_lag = Histogram("guardian_event_loop_lag_seconds", "How late the event loop ran a scheduled probe.",
+                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+
+
+class DockerError(Exception):
+    """Raised when the Docker Engine API rejects a request or cannot be reached."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class SingleFlight:
+    """Coalesces identical in-flight calls into one and optionally reuses the result for a short TTL."""
+
+    def __init__(self):
+        self.inflight = {}  # key -> task shared by every caller
+        self.cache = {}  # key -> (completed monotonic time, result)
+        self.generation = 0  # Bumped by invalidate() so results started before a mutation are not cached
+        self.calls = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    async def run(self, key, factory, ttl=0):
+        self.calls += 1
+        if ttl > 0:
+            cached = self.cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < ttl:
+                self.cache_hits += 1
+                return cached[1]
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self.inflight[key] = task
+            task.add_done_callback(lambda done, generation=self.generation: self._complete(key, done, generation, ttl))
+        else:
+            self.coalesced += 1
+        # Shield so one caller being cancelled does not cancel the request for everyone else
+        return await asyncio.shield(task)
+
+    def _complete(self, key, task, generation, ttl):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if ttl > 0 and generation == self.generation:
+            self.cache[key] = (time.monotonic(), task.result())
+
+    def invalidate(self):
+        self.generation += 1
+        self.cache.clear()
+
+
+class SSHTunnel:
+    """Forwards a remote Docker socket to a local unix socket using the system ssh client."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.destination = f"{parts.username}@{parts.hostname}" if parts.username else parts.hostname
+        self.port = parts.port
+        self.remote_socket = parts.path or "/var/run/docker.sock"
+        self.path = os.path.join(tempfile.gettempdir(), f"guardian-{parts.hostname}-{parts.port or 22}.sock")
+        self.process = None
+        self.lock = asyncio.Lock()
+
+    def alive(self):
+        return self.process is not None and self.process.returncode is None and os.path.exists(self.path)
+
+    async def ensure(self):
+        """Start (or restart) the tunnel and wait until its local socket exists."""
+        if self.alive():
+            return
+        async with self.lock:
+            if self.alive():
+                return
+            if self.process is not None and self.process.returncode is None:
+                self.process.kill()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.path)
+            command = ["ssh", "-nNT", "-o", "BatchMode=yes", "-o", "ExitOnForwardFailure=yes", "-o", "ServerAliveInterval=15",
+                       "-o", f"ConnectTimeout={HOST_TIMEOUT}", "-L", f"{self.path}:{self.remote_socket}", self.destination]
+            if self.port:
+                command[1:1] = ["-p", str(self.port)]
+            self.process = await asyncio.create_subprocess_exec(*command, stdin=subprocess.DEVNULL,
+                                                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            deadline = time.monotonic() + HOST_TIMEOUT
+            while not os.path.exists(self.path):
+                if self.process.returncode is not None or time.monotonic() > deadline:
+                    if self.process.returncode is None:
+                        self.process.kill()
+                    error = (await self.process.stderr.read()).decode(errors="replace").strip()
+                    raise DockerError(f"SSH tunnel to {self.destination} failed: {error or 'timed out'}")
+                await asyncio.sleep(0.1)
+
+
+ssh_tunnels = {}  # ssh:// URL -> SSHTunnel shared by every client of that host
+
+
+class DockerClient:
+    """Async Docker Engine API client sharing one keep-alive connection pool.
+
+    The endpoint is a unix:// socket, tcp:// (optionally with TLS client certificates)
+    or ssh://user@host, which is reached through a forwarded socket.
+    """
+
+    def __init__(self, host=DOCKER_HOST, api_version=DOCKER_API_VERSION, pool_size=32, tls=None):
+        self.host = host
+        self.api_version = api_version
+        self.pool_size = pool_size
+        self.tls = tls  # {"ca", "cert", "key"} file paths for tcp:// endpoints
+        self.tunnel = ssh_tunnels.setdefault(host, SSHTunnel(host)) if host.startswith("ssh://") else None
+        self._session = None
+        self.flights = SingleFlight()  # Identical GETs share one round trip
+
+    @classmethod
+    def from_config(cls, spec, **kwargs):
+        """Build a client from a docker_hosts entry: a URL string or {"url": ..., "tls": {...}}."""
+        if isinstance(spec, str):
+            return cls(spec, **kwargs)
+        return cls(spec["url"], tls=spec.get("tls"), **kwargs)
+
+    def _ssl_context(self):
+        context = ssl.create_default_context(cafile=self.tls.get("ca"))
+        if self.tls.get("cert"):
+            context.load_cert_chain(self.tls["cert"], self.tls.get("key"))
+        if self.tls.get("verify") is False:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        return context
+
+    def _get_session(self):
+        # Created lazily so the session binds to the running event loop
+        if self._session is None or self._session.closed:
+            if self.host.startswith("unix://"):
+                connector = aiohttp.UnixConnector(path=self.host[len("unix://"):], limit=self.pool_size, keepalive_timeout=60)
+                self._base_url = "http://docker"
+            elif self.tunnel is not None:
+                connector = aiohttp.UnixConnector(path=self.tunnel.path, limit=self.pool_size, keepalive_timeout=60)
+                self._base_url = "http://docker"
+            elif self.host.startswith(("tcp://", "http://", "https://")):
+                secure = self.tls is not None or self.host.startswith("https://")
+                connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60,
+                                                 ssl=self._ssl_context() if self.tls else None)
+                self._base_url = ("https://" if secure else "http://") + self.host.split("://", 1)[1]
+            else:
+                raise DockerError(f"Unsupported docker_host: {self.host}")
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _url(self, path):
+        return f"{self._base_url}/{self.api_version}{path}"
+
+    @staticmethod
+    def _params(params):
+        """Drop unset values and encode booleans/filters the way the Engine API expects."""
+        encoded = {}
+        for key, value in (params or {}).items():
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = "true" if value else "false"
+            elif isinstance(value, dict):
+                value = json.dumps(value)
+            encoded[key] = str(value)
+        return encoded
+
+    @staticmethod
+    def _operation(method, path):
+        """Metric label for a request, with container and image names replaced by a placeholder."""
+        if path.startswith("/images/") and path not in ("/images/json", "/images/create", "/images/prune"):
+            return f"{method} /images/{{name}}"  # Image references may contain slashes
+        return f"{method} " + re.sub(r"^/containers/(?!json$)[^/]+", "/containers/{name}", path)
+
+    @staticmethod
+    async def _raise_for_status(response):
+        if response.status < 400:
+            return
+        body = await response.read()
+        try:
+            message = json.loads(body).get("message", "")
+        except ValueError:
+            message = body.decode(errors="replace")
+        raise DockerError(message.strip() or f"HTTP {response.status}", response.status)
+
+    async def request(self, method, path, params=None, body=None, timeout=60, cache_ttl=0):
+        """Send a request and return the decoded JSON body (or None when empty).
+
+        Concurrent identical GETs are coalesced into one round trip; with cache_ttl the result is also
+        reused for that many seconds. Any other method invalidates cached results when it completes.
+        """
+        params = self._params(params)
+        if method == "GET":
+            key = (path, tuple(sorted(params.items())))
+            return await self.flights.run(key, lambda: self._send(method, path, params, body, timeout), ttl=cache_ttl)
+        try:
+            return await self._send(method, path, params, body, timeout)
+        finally:
+            self.flights.invalidate()
+
+    async def _send(self, method, path, params, body, timeout):
+        if self.tunnel is not None:
+            await self.tunnel.ensure()
+        session = self._get_session()
+        operation = self._operation(method, path)
+        started = time.monotonic()
+        try:
+            async with session.request(method, self._url(path), params=params, json=body,
+                                       timeout=aiohttp.ClientTimeout(total=timeout, sock_connect=HOST_TIMEOUT)) as response:
+                await self._raise_for_status(response)
+                data = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            docker_errors.inc(operation)
+            raise DockerError(f"Docker API unavailable: {e}") from e
+        except DockerError:
+            docker_errors.inc(operation)
+            raise
+        finally:
+            docker_latency.observe(time.monotonic() - started, operation)
+        return json.loads(data) if data.strip() else None
+
+    async def stream(self, method, path, params=None, body=None):
+        """Yield raw response chunks from a streaming endpoint until it closes."""
+        if self.tunnel is not None:
+            await self.tunnel.ensure()
+        session = self._get_session()
+        operation = self._operation(method, path)
+        try:
+            async with session.request(method, self._url(path), params=self._params(params), json=body,
+                                       timeout=aiohttp.ClientTimeout(total=None, sock_connect=HOST_TIMEOUT)) as response:
+                await self._raise_for_status(response)
+                async for chunk in response.content.iter_any():
+                    yield chunk
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            docker_errors.inc(operation)
+            raise DockerError(f"Docker API unavailable: {e}") from e
+        except DockerError:
+            docker_errors.inc(operation)
+            raise
+
+    async def json_stream(self, method, path, params=None, body=None):
+        """Yield newline-delimited JSON objects (events, stats, pull progress)."""
+        buffer = b""
+        async with contextlib.aclosing(self.stream(method, path, params, body)) as chunks:
+            async for chunk in chunks:
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)
+        if buffer.strip():
+            yield json.loads(buffer)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    # Containers
+
+    async def containers(self, all=True):
+        return await self.request("GET", "/containers/json", {"all": all})
+
+    async def inspect(self, name):
+        return await self.request("GET", f"/containers/{quote(name, safe='')}/json")
+
+    async def container_action(self, name, action):
+        """Run start/stop/restart/pause/unpause on a container."""
+        await self.request("POST", f"/containers/{quote(name, safe='')}/{action}", timeout=120)
+
+    async def remove_container(self, name):
+        await self.request("DELETE", f"/containers/{quote(name, safe='')}")
+
+    async def update(self, name, nano_cpus=None, memory=None):
+        body = {}
+        if nano_cpus is not None:
+            body["NanoCpus"] = nano_cpus
+        if memory is not None:
+            body["Memory"] = memory
+        return await self.request("POST", f"/containers/{quote(name, safe='')}/update", body=body)
+
+    async def stats(self, name):
+        """Take a single stats sample (the daemon waits one interval to fill precpu_stats)."""
+        return await self.request("GET", f"/containers/{quote(name, safe='')}/stats", {"stream": False})
+
+    async def logs(self, name, since=None, follow=False, tail=None):
+        """Yield decoded log lines, demultiplexing stdout/stderr frames for non-TTY containers."""
+        tty = (await self.inspect(name))["Config"].get("Tty", False)
+        params = {"stdout": True, "stderr": True, "follow": follow, "since": since, "tail": tail}
+        pending = bytearray()
+        text = bytearray()
+        async with contextlib.aclosing(self.stream("GET", f"/containers/{quote(name, safe='')}/logs", params)) as chunks:
+            async for chunk in chunks:
+                if tty:
+                    text += chunk
+                else:
+                    pending += chunk
+                    # Each frame is an 8-byte header (stream, 0, 0, 0, big-endian size) plus payload
+                    while len(pending) >= 8:
+                        size = int.from_bytes(pending[4:8], "big")
+                        if len(pending) < 8 + size:
+                            break
+                        text += pending[8:8 + size]
+                        del pending[:8 + size]
+                *lines, rest = bytes(text).split(b"\n")
+                text = bytearray(rest)
+                for line in lines:
+                    yield line.decode(errors="replace").rstrip("\r")
+        if text:
+            yield bytes(text).decode(errors="replace").rstrip("\r")
+
+    # Images and system
+
+    async def images(self, cache_ttl=0):
+        return await self.request("GET", "/images/json", cache_ttl=cache_ttl)
+
+    async def pull(self, image, on_progress=None):
+        """Pull an image, raising DockerError if the progress stream reports a failure."""
+        repo, tag = split_image_ref(image)
+        try:
+            async with contextlib.aclosing(self.json_stream("POST", "/images/create", {"fromImage": repo, "tag": tag})) as progress:
+                async for event in progress:
+                    if "error" in event:
+                        raise DockerError(event["error"])
+                    if on_progress:
+                        on_progress(event)
+        finally:
+            self.flights.invalidate()
+
+    async def remove_image(self, image):
+        return await self.request("DELETE", f"/images/{quote(image, safe='/:@')}")
+
+    async def prune_images(self, all=False):
+        filters = {"dangling": ["false"]} if all else None
+        return await self.request("POST", "/images/prune", {"filters": filters}, timeout=600)
+
+    async def image_inspect(self, image):
+        return await self.request("GET", f"/images/{quote(image, safe='/:@')}/json")
+
+    async def image_history(self, image):
+        return await self.request("GET", f"/images/{quote(image, safe='/:@')}/history")
+
+    async def system_df(self, cache_ttl=0):
+        return await self.request("GET", "/system/df", timeout=300, cache_ttl=cache_ttl)
+
+    async def info(self):
+        return await self.request("GET", "/info")
+
+
+docker_clients = {name: DockerClient.from_config(spec) for name, spec in DOCKER_HOSTS.items()}
+docker = next(iter(docker_clients.values()))  # Default host, used by commands that take no host
+
+
+def resolve_container(name):
+    """Map a (possibly host-qualified) container name to its host's client and its name on that host."""
+    if not FLEET_MODE:
+        return docker, name
+    host, qualified, container = name.partition("/")
+    if qualified and host in docker_clients:
+        return docker_clients[host], container
+    # Unqualified names are accepted when exactly one host has a container by that name
+    matches = [host for host, host_inventory in host_inventories.items() if f"{host}/{name}" in host_inventory.names]
+    if len(matches) > 1:
+        raise DockerError(f"`{name}` exists on several hosts ({', '.join(matches)}); use host/container")
+    if not matches:
+        raise DockerError(f"No container named `{name}` on any host; use host/container")
+    return docker_clients[matches[0]], name
+
+
+class ConcurrencyLimitError(DockerError):
+    """Raised when a user already has the maximum number of mutating operations in flight."""
+
+
+class OperationLimiter:
+    """Caps concurrent mutating Docker operations per user (rejecting extras) and globally (queueing extras)."""
+
+    def __init__(self, global_limit=MAX_CONCURRENT_OPERATIONS, per_user_limit=MAX_OPERATIONS_PER_USER):
+        self.semaphore = asyncio.Semaphore(global_limit)
+        self.per_user_limit = per_user_limit
+        self.active = {}  # user id -> operations in flight
+
+    @contextlib.asynccontextmanager
+    async def slot(self, user_id):
+        if self.active.get(user_id, 0) >= self.per_user_limit:
+            raise ConcurrencyLimitError(f"you already have {self.per_user_limit} Docker operation(s) running, please wait for them to finish.")
+        self.active[user_id] = self.active.get(user_id, 0) + 1
+        try:
+            async with self.semaphore:
+                yield
+        finally:
+            self.active[user_id] -= 1
+            if not self.active[user_id]:
+                del self.active[user_id]
+
+
+operations = OperationLimiter()
+
+
+def image_label(image):
+    tags = [tag for tag in image.get("RepoTags") or [] if tag != "<none>:<none>"]
+    return tags[0] if tags else image["Id"].split(":", 1)[-1][:12]
+
+
+class DiskUsageModel:
+    """Cached `docker system df` plus the image layer graph for one host, refreshed stale-while-revalidate.
+
+    Readers get the last snapshot immediately; a stale snapshot starts one background
+    refresh. Image ids are content addressed, so each image's layers are looked up once
+    and only new images are inspected on later refreshes.
+    """
+
+    def __init__(self, client, max_age=DISK_USAGE_MAX_AGE):
+        self.client = client
+        self.max_age = max_age
+        self.df = None
+        self.updated_at = None  # Epoch seconds the current snapshot was requested at
+        self.error = None
+        self.image_layers = {}  # image id -> ((chain id, bytes), ...) or None if the history could not be matched up
+        self.generation = None  # Client mutation generation the snapshot was taken at
+        self.task = None
+
+    def stale(self):
+        return (self.updated_at is None or time.time() - self.updated_at > self.max_age
+                or self.generation != self.client.flights.generation)  # Something was pulled, removed or pruned since
+
+    def snapshot(self):
+        """Return the cached df (None before the first refresh), starting a refresh if it is stale."""
+        if self.stale():
+            self.refresh()
+        return self.df
+
+    def refresh(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._refresh())
+        return self.task
+
+    async def current(self):
+        """Return a df that is not stale, waiting for a refresh if needed."""
+        if self.stale():
+            await self.refresh()
+        if self.df is None:
+            raise DockerError(self.error or "Disk usage is not available")
+        return self.df
+
+    async def _refresh(self):
+        started, generation = time.time(), self.client.flights.generation
+        try:
+            df = await self.client.system_df()
+            await self._map_layers(df.get("Images") or [])
+            self.df, self.updated_at, self.generation, self.error = df, started, generation, None
+        except DockerError as e:
+            self.error = str(e)
+            print(f"❌ Error refreshing disk usage: {e}")
+
+    async def _map_layers(self, images):
+        present = {image["Id"] for image in images}
+        for image_id in self.image_layers.keys() - present:
+            del self.image_layers[image_id]
+        semaphore = asyncio.Semaphore(4)
+
+        async def load(image):
+            async with semaphore:
+                info = await self.client.image_inspect(image["Id"])
+                history = await self.client.image_history(image["Id"])
+            self.image_layers[image["Id"]] = self._layers(info, history, image["Size"])
+
+        results = await asyncio.gather(*(load(image) for image in images if image["Id"] not in self.image_layers), return_exceptions=True)
+        for result in results:
+            if isinstance(result, DockerError) and result.status != 404:  # 404: removed while we were looking
+                raise result
+
+    @staticmethod
+    def _layers(info, history, size):
+        """Pair every layer's chain id with its size, or None when history and layers do not line up."""
+        diff_ids = (info.get("RootFS") or {}).get("Layers") or []
+        steps = [entry.get("Size", 0) for entry in reversed(history)]  # Oldest first, like the layers
+        if len(steps) != len(diff_ids):
+            steps = [step for step in steps if step > 0]  # Drop metadata-only steps (ENV, CMD, ...)
+        if len(steps) != len(diff_ids) or abs(sum(steps) - size) > max(size // 100, 1024):
+            return None
+        layers, chain_id = [], None
+        for diff_id, step in zip(diff_ids, steps):
+            # Chain ids identify a layer together with everything below it, the way the daemon shares them
+            chain_id = diff_id if chain_id is None else "sha256:" + hashlib.sha256(f"{chain_id} {diff_id}".encode()).hexdigest()
+            layers.append((chain_id, step))
+        return tuple(layers)
+
+    def prune_plan(self, all):
+        """Images `docker image prune` would remove, the bytes really freed, their summed sizes and whether that is exact."""
+        images = self.df.get("Images") or []
+        dangling = lambda image: not image.get("RepoTags") or image["RepoTags"] == ["<none>:<none>"]
+        doomed = [image for image in images if image.get("Containers", 0) == 0 and (all or dangling(image))]
+        doomed_ids = {image["Id"] for image in doomed}
+
+        # A layer is freed only when every image using it is removed
+        users, doomed_users, sizes = {}, {}, {}
+        for image_id, layers in self.image_layers.items():
+            for chain_id, layer_size in set(layers or ()):
+                users[chain_id] = users.get(chain_id, 0) + 1
+                if image_id in doomed_ids:
+                    doomed_users[chain_id] = doomed_users.get(chain_id, 0) + 1
+                    sizes[chain_id] = layer_size
+        reclaimed = sum(sizes[chain_id] for chain_id, count in doomed_users.items() if count == users[chain_id])
+
+        # Images whose layers are unknown fall back to the daemon's unshared size, and make the total an estimate
+        unmapped = [image for image in images if self.image_layers.get(image["Id"]) is None]
+        reclaimed += sum(image["Size"] - max(image.get("SharedSize", 0), 0) for image in doomed if self.image_layers.get(image["Id"]) is None)
+        return doomed, reclaimed, sum(image["Size"] for image in doomed), not unmapped
+
+
+disk_usage = {name: DiskUsageModel(client) for name, client in docker_clients.items()}
+
+
+class PullJob:
+    """One image pull on one host, with its progress folded down to per-layer byte counts."""
+
+    DONE_STATUSES = {"Pull complete", "Already exists"}
+
+    def __init__(self, host, image):
+        self.host = host
+        self.client = docker_clients[host]
+        self.image = image
+        self.layers = {}  # layer id -> [current bytes, total bytes, done]
+        self.state = "queued"  # queued, pulling, done or failed
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+
+    def update(self, event):
+        layer_id = event.get("id")
+        status = event.get("status", "")
+        if not layer_id or status.startswith(("Pulling from", "Digest", "Status")):
+            return
+        layer = self.layers.setdefault(layer_id, [0, 0, False])
+        detail = event.get("progressDetail") or {}
+        if status == "Downloading" and detail.get("total"):
+            layer[0], layer[1] = detail.get("current", 0), detail["total"]
+        elif status in ("Download complete", "Extracting"):
+            layer[0] = layer[1]
+        elif status in self.DONE_STATUSES:
+            layer[0], layer[2] = layer[1], True
+
+    def summary(self):
+        if self.state == "queued":
+            return "⏳", "queued"
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        if self.state == "failed":
+            return "❌", f"failed after {elapsed:.0f}s: {self.error}"
+        done = sum(1 for layer in self.layers.values() if layer[2])
+        current = sum(layer[0] for layer in self.layers.values())
+        total = sum(layer[1] for layer in self.layers.values())
+        size = f" · {format_bytes(current)} / {format_bytes(total)}" if total else ""
+        if self.state == "done":
+            return "✅", f"pulled in {elapsed:.0f}s ({len(self.layers)} layers{size})"
+        return "🔄", f"{done}/{len(self.layers)} layers{size}"
+
+    async def run(self, semaphore):
+        try:
+            async with semaphore:
+                self.state, self.started_at = "pulling", time.monotonic()
+                await self.client.pull(self.image, on_progress=self.update)
+            self.state = "done"
+        except (DockerError, ValueError) as e:
+            # ValueError covers a malformed progress stream; either way the job must end as failed, not stay "pulling"
+            self.state, self.error = "failed", str(e)
+        finally:
+            self.finished_at = time.monotonic()
+            if self.started_at is None:
+                self.started_at = self.finished_at
+
+
+class PullQueue:
+    """Runs image pulls in the background, at most `limit` per host, sharing one pull per image."""
+
+    def __init__(self, limit=MAX_CONCURRENT_PULLS):
+        self.limit = limit
+        self.jobs = {}  # (host, repo, tag) -> PullJob still queued or pulling
+        self.semaphores = {}  # host -> semaphore
+
+    def submit(self, host, image):
+        """Return the job pulling this image on this host, starting one if none is in flight."""
+        key = (host, *split_image_ref(image))
+        job = self.jobs.get(key)
+        if job is None:
+            semaphore = self.semaphores.setdefault(host, asyncio.Semaphore(self.limit))
+            job = self.jobs[key] = PullJob(host, image)
+            job.task = asyncio.ensure_future(job.run(semaphore))
+            job.task.add_done_callback(lambda _: self.jobs.pop(key, None))
+        return job
+
+
+pulls = PullQueue()
+
+def parse_docker_time(value):
+    """Convert an Engine API RFC 3339 timestamp to epoch seconds (None for the zero time)."""
+    if not value or value.startswith("0001-"):
+        return None
+    return datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+
+def human_duration(seconds):
+    """Approximate a duration the way `docker ps` does (e.g. `About an hour`)."""
+    seconds = max(int(seconds), 0)
+    if seconds < 1:
+        return "Less than a second"
+    if seconds < 60:
+        return f"{seconds} seconds"
+    minutes = seconds // 60
+    if minutes == 1:
+        return "About a minute"
+    if minutes < 60:
+        return f"{minutes} minutes"
+    hours = minutes // 60
+    if hours == 1:
+        return "About an hour"
+    if hours < 48:
+        return f"{hours} hours"
+    if hours < 24 * 14:
+        return f"{hours // 24} days"
+    if hours < 24 * 60:
+        return f"{hours // (24 * 7)} weeks"
+    if hours < 24 * 365 * 2:
+        return f"{hours // (24 * 30)} months"
+    return f"{hours // (24 * 365)} years"
+
+def describe_status(entry):
+    """Render an inventory entry's state like the STATUS column of `docker ps`."""
+    now = time.time()
+    state = entry["status"]
+    if state in ("running", "paused"):
+        status = f"Up {human_duration(now - (entry['started_at'] or now))}"
+        if entry["health"]:
+            status += f" ({entry['health']})"
+        return status + (" (Paused)" if state == "paused" else "")
+    if state == "restarting":
+        return f"Restarting ({entry['exit_code']}) {human_duration(now - (entry['finished_at'] or now))} ago"
+    if state in ("exited", "dead"):
+        return f"Exited ({entry['exit_code']}) {human_duration(now - (entry['finished_at'] or now))} ago"
+    return state.capitalize()
+
+
+class ContainerInventory:
+    """In-memory container inventory, filled once and kept current from the Docker events stream."""
+
+    # Container events that can change what we track; exec_* and attach noise is ignored
+    TRACKED_EVENTS = {"create", "start", "restart", "die", "stop", "kill", "oom", "pause", "unpause", "rename", "update", "destroy"}
+
+    def __init__(self, client, host=None):
+        self.client = client
+        self.host = host  # Set in fleet mode; names are then qualified as host/container
+        self.containers = {}  # container id -> entry
+        self.names = {}  # container name -> container id
+        self.sorted_names = []
+        self.synced_at = None
+        self.version = 0  # Bumped whenever containers are added, renamed or removed
+        self.mem_total = None  # The host's memory from /info, for memory-percent alerts
+        self.connected = False
+        self.ready = asyncio.Event()
+        self.task = None
+
+    def _entry(self, info):
+        state = info["State"]
+        return {
+            "id": info["Id"],
+            "name": f"{self.host}/{info['Name'].lstrip('/')}" if self.host else info["Name"].lstrip("/"),
+            "image": info["Config"].get("Image", ""),
+            "status": state["Status"],
+            "health": (state.get("Health") or {}).get("Status"),
+            "exit_code": state.get("ExitCode", 0),
+            "started_at": parse_docker_time(state.get("StartedAt")),
+            "finished_at": parse_docker_time(state.get("FinishedAt")),
+            "restart_count": info.get("RestartCount", 0),
+            "labels": info["Config"].get("Labels") or {},
+        }
+
+    def _store(self, entry):
+        previous = self.containers.get(entry["id"])
+        if previous and previous["name"] != entry["name"]:
+            self.names.pop(previous["name"], None)
+        self.containers[entry["id"]] = entry
+        self.names[entry["name"]] = entry["id"]
+        self.sorted_names = sorted(self.names)
+        self.version += 1
+
+    def _discard(self, container_id):
+        entry = self.containers.pop(container_id, None)
+        if entry:
+            self.names.pop(entry["name"], None)
+            self.sorted_names = sorted(self.names)
+            self.version += 1
+
+    async def resync(self):
+        """Rebuild the inventory from scratch (startup and after the event stream reconnects)."""
+        containers, info = await asyncio.gather(self.client.containers(all=True), self.client.info())
+        self.mem_total = info.get("MemTotal") or None
+        semaphore = asyncio.Semaphore(16)
+
+        async def inspect(container_id):
+            async with semaphore:
+                return await self.client.inspect(container_id)
+
+        results = await asyncio.gather(*(inspect(c["Id"]) for c in containers), return_exceptions=True)
+        entries = [self._entry(info) for info in results if not isinstance(info, Exception)]
+        self.containers = {entry["id"]: entry for entry in entries}
+        self.names = {entry["name"]: entry["id"] for entry in entries}
+        self.sorted_names = sorted(self.names)
+        self.synced_at = time.time()
+        self.version += 1
+        self.connected = True
+        self.ready.set()
+
+    async def refresh(self, container_id):
+        try:
+            self._store(self._entry(await self.client.inspect(container_id)))
+        except DockerError as e:
+            if e.status == 404:
+                self._discard(container_id)
+            else:
+                raise
+
+    def apply_event(self, event):
+        """Apply a container event; returns the container id if it needs re-inspecting."""
+        action = event.get("Action", "")
+        container_id = event.get("Actor", {}).get("ID") or event.get("id")
+        entry = self.containers.get(container_id)
+        if action.startswith("health_status"):
+            if entry:
+                entry["health"] = action.split(":", 1)[1].strip()
+            return None
+        if action not in self.TRACKED_EVENTS:
+            return None
+        if action == "destroy":
+            self._discard(container_id)
+            return None
+        return container_id
+
+    async def run(self):
+        """Resync, then follow the events stream forever, resyncing after every reconnect."""
+        backoff = 1
+        while not bot.is_closed():
+            try:
+                since = int(time.time())
+                await self.resync()
+                backoff = 1
+                events = self.client.json_stream("GET", "/events", {"since": since, "filters": {"type": ["container"]}})
+                async with contextlib.aclosing(events) as stream:
+                    async for event in stream:
+                        event_timeline.record(self.host, event)
+                        container_id = self.apply_event(event)
+                        if container_id:
+                            await self.refresh(container_id)
+            except (DockerError, ValueError) as e:
+                print(f"❌ Container event stream interrupted{f' on {self.host}' if self.host else ''}: {e}")
+            self.connected = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = bot.loop.create_task(self.run())
+
+    async def wait_ready(self, timeout=10):
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise DockerError("Container inventory is not available yet")
+
+    def unavailable(self):
+        """Hosts whose events stream is currently down."""
+        return [] if self.connected else [self.host or "docker"]
+
+    def host_memory(self, container_id):
+        """Memory of the host running a container, or None when its host has not reported it."""
+        return self.mem_total
+
+    def get(self, name):
+        container_id = self.names.get(name)
+        return self.containers.get(container_id) if container_id else None
+
+    def running(self):
+        return [entry for entry in self.containers.values() if entry["status"] == "running"]
+
+    def search(self, query, limit=25):
+        """Prefix matches first, then substring, then in-order (fuzzy) character matches."""
+        query = (query or "").lower()
+        if not query:
+            return self.sorted_names[:limit]
+        prefix, substring, fuzzy = [], [], []
+        for name in self.sorted_names:
+            lowered = name.lower()
+            if lowered.startswith(query):
+                prefix.append(name)
+            elif query in lowered:
+                substring.append(name)
+            else:
+                chars = iter(lowered)
+                if all(char in chars for char in query):
+                    fuzzy.append(name)
+            if len(prefix) >= limit:
+                break
+        return (prefix + substring + fuzzy)[:limit]
+
+    def select(self, selector):
+        """Entries matching a name glob (web-*), label:key[=value] or project:name, sorted by name."""
+        kind, _, value = selector.partition(":")
+        if kind == "label" and value:
+            key, has_value, wanted = value.partition("=")
+            matches = lambda entry: key in entry["labels"] and (not has_value or entry["labels"][key] == wanted)
+        elif kind == "project" and value:
+            matches = lambda entry: entry["labels"].get("com.docker.compose.project") == value
+        else:
+            matches = lambda entry: fnmatch.fnmatchcase(entry["name"], selector)
+        return sorted(filter(matches, self.containers.values()), key=lambda entry: entry["name"])
+
+
+class FleetInventory(ContainerInventory):
+    """Merged, read-only view over every host's inventory, so commands see one fleet-wide container list."""
+
+    def __init__(self, inventories):
+        self.inventories = inventories  # host -> ContainerInventory
+        self.ready = asyncio.Event()
+        self.settled = asyncio.Event()  # Set once the startup grace period is over
+        self.task = None
+        self._versions = None
+
+    def _merge(self):
+        versions = tuple(host_inventory.version for host_inventory in self.inventories.values())
+        if versions != self._versions:
+            self._containers, self._names = {}, {}
+            for host_inventory in self.inventories.values():
+                self._containers.update(host_inventory.containers)
+                self._names.update(host_inventory.names)
+            self._sorted_names = sorted(self._names)
+            self._versions = versions
+
+    @property
+    def containers(self):
+        self._merge()
+        return self._containers
+
+    @property
+    def names(self):
+        self._merge()
+        return self._names
+
+    @property
+    def sorted_names(self):
+        self._merge()
+        return self._sorted_names
+
+    async def run(self):
+        waiters = [asyncio.ensure_future(host_inventory.ready.wait()) for host_inventory in self.inventories.values()]
+        # Grace period, once at startup: give every host HOST_TIMEOUT to sync so early commands see the whole fleet
+        await asyncio.wait(waiters, timeout=HOST_TIMEOUT)
+        self.settled.set()
+        # Then ready as soon as any host has synced, so one dead host cannot hold up the others
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waiters:
+            waiter.cancel()
+        self.ready.set()
+
+    def start(self):
+        for host_inventory in self.inventories.values():
+            host_inventory.start()
+        super().start()
+
+    async def wait_ready(self, timeout=HOST_TIMEOUT):
+        """Wait out the startup grace period, then return at once if any host has synced.
+
+        Hosts that have not synced are reported by unavailable(), never waited on per command.
+        """
+        if not self.settled.is_set():
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self.settled.wait(), timeout)
+        if not any(host_inventory.ready.is_set() for host_inventory in self.inventories.values()):
+            raise DockerError("No Docker host is reachable")
+
+    def unavailable(self):
+        return [host for host, host_inventory in self.inventories.items() if not host_inventory.connected]
+
+    def host_memory(self, container_id):
+        for host_inventory in self.inventories.values():
+            if container_id in host_inventory.containers:
+                return host_inventory.mem_total
+        return None
+
+
+host_inventories = {name: ContainerInventory(client, host=name if FLEET_MODE else None) for name, client in docker_clients.items()}
+inventory = FleetInventory(host_inventories) if FLEET_MODE else host_inventories[next(iter(host_inventories))]
+
+
+class StatsCollector:
+    """Keeps one streaming stats subscription per running container and publishes samples every interval."""
+
+    def __init__(self, client, inventory, interval=STATS_INTERVAL):
+        self.client = client
+        self.inventory = inventory
+        self.interval = interval
+        self.streams = {}  # container id -> streaming task
+        self.latest = {}  # container id -> most recent sample
+        self.subscribers = []
+        self.task = None
+
+    async def _follow(self, container_id):
+        previous = None
+        try:
+            stream = self.client.json_stream("GET", f"/containers/{container_id}/stats", {"stream": True})
+            async with contextlib.aclosing(stream) as payloads:
+                async for raw in payloads:
+                    if previous is not None:
+                        sample = calculate_stats(raw, previous)
+                        sample["timestamp"] = time.time()
+                        self.latest[container_id] = sample
+                    previous = raw
+        except (DockerError, ValueError) as e:
+            print(f"❌ Stats stream for {container_id[:12]} ended: {e}")
+        finally:
+            if self.streams.get(container_id) is asyncio.current_task():
+                del self.streams[container_id]
+                self.latest.pop(container_id, None)
+
+    def _reconcile(self):
+        """Subscribe to newly started containers and drop the ones that stopped."""
+        running = {entry["id"] for entry in self.inventory.running()}
+        for container_id in running - self.streams.keys():
+            self.streams[container_id] = asyncio.create_task(self._follow(container_id))
+        for container_id in self.streams.keys() - running:
+            self.streams.pop(container_id).cancel()
+            self.latest.pop(container_id, None)
+
+    def subscribe(self):
+        """Return a queue that always holds the most recently published batch of samples."""
+        queue = asyncio.Queue(maxsize=1)
+        self.subscribers.append(queue)
+        return queue
+
+    def samples(self):
+        """Latest sample of every tracked container, tagged with its id and name."""
+        samples = []
+        for container_id, sample in self.latest.items():
+            entry = self.inventory.containers.get(container_id)
+            if entry:
+                samples.append(dict(sample, id=container_id, name=entry["name"]))
+        return samples
+
+    def publish(self):
+        if not self.subscribers:
+            return
+        samples = self.samples()
+        for queue in self.subscribers:
+            # Slow subscribers only ever see the newest batch
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(samples)
+
+    async def run(self):
+        while not bot.is_closed():
+            try:
+                await self.inventory.wait_ready()
+                self._reconcile()
+                self.publish()
+            except DockerError as e:
+                print(f"❌ Error collecting container stats: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = bot.loop.create_task(self.run())
+
+
+class CgroupStatsCollector(StatsCollector):
+    """Samples every container in a single pass straight from the cgroup v2 filesystem."""
+
+    # Container cgroups under the systemd and cgroupfs drivers respectively
+    CGROUP_PATTERNS = ("system.slice/docker-*.scope", "docker/*")
+
+    def __init__(self, inventory, root=CGROUP_ROOT, interval=STATS_INTERVAL):
+        super().__init__(None, inventory, interval)
+        self.root = root
+        self.paths = {}  # container id -> cgroup directory
+        self.previous = {}  # container id -> (monotonic time, usage_usec)
+        self.host_memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+    def _scan(self):
+        paths = {}
+        for pattern in self.CGROUP_PATTERNS:
+            for path in glob.glob(os.path.join(self.root, pattern)):
+                name = os.path.basename(path)
+                if name.startswith("docker-") and name.endswith(".scope"):
+                    name = name[len("docker-"):-len(".scope")]
+                paths[name] = path
+        self.paths = paths
+
+    @staticmethod
+    def _read(path):
+        with open(path) as file:
+            return file.read()
+
+    @staticmethod
+    def _read_keyed(path):
+        """Parse flat `key value` files such as cpu.stat and memory.stat."""
+        with open(path) as file:
+            return {key: int(value) for key, value in (line.split() for line in file if line.strip())}
+
+    def _sample(self, container_id, path, now):
+        usage_usec = self._read_keyed(os.path.join(path, "cpu.stat"))["usage_usec"]
+        mem_current = int(self._read(os.path.join(path, "memory.current")))
+        mem_max = self._read(os.path.join(path, "memory.max")).strip()
+        mem_limit = self.host_memory if mem_max == "max" else int(mem_max)
+        try:
+            inactive_file = self._read_keyed(os.path.join(path, "memory.stat")).get("inactive_file", 0)
+        except OSError:
+            inactive_file = 0
+
+        blk_read = blk_write = 0
+        with open(os.path.join(path, "io.stat")) as file:
+            for line in file:
+                for field in line.split()[1:]:
+                    key, _, value = field.partition("=")
+                    if key == "rbytes":
+                        blk_read += int(value)
+                    elif key == "wbytes":
+                        blk_write += int(value)
+
+        # usage_usec over wall-clock usec equals the Engine API's per-core percentage
+        previous = self.previous.get(container_id)
+        self.previous[container_id] = (now, usage_usec)
+        if previous is None or now <= previous[0]:
+            return None
+        cpu_percent = (usage_usec - previous[1]) / ((now - previous[0]) * 1e6) * 100
+
+        mem_usage = max(mem_current - inactive_file, 0)
+        return {
+            "cpu_percent": max(cpu_percent, 0.0),
+            "mem_usage": mem_usage,
+            "mem_limit": mem_limit,
+            "mem_percent": mem_usage / mem_limit * 100 if mem_limit else 0.0,
+            "net_rx": 0,  # Network counters live in the container's netns, not its cgroup
+            "net_tx": 0,
+            "blk_read": blk_read,
+            "blk_write": blk_write,
+            "timestamp": time.time(),
+        }
+
+    def sample_all(self, container_ids):
+        """Read the cgroup files of every given container; runs in a worker thread."""
+        if any(container_id not in self.paths for container_id in container_ids):
+            self._scan()
+        now = time.monotonic()
+        samples = {}
+        for container_id in container_ids:
+            path = self.paths.get(container_id)
+            if not path:
+                continue
+            try:
+                sample = self._sample(container_id, path, now)
+            except (OSError, KeyError, ValueError):
+                # The container exited between the scan and the read
+                self.paths.pop(container_id, None)
+                continue
+            if sample:
+                samples[container_id] = sample
+        for container_id in self.previous.keys() - set(container_ids):
+            del self.previous[container_id]
+        return samples
+
+    async def run(self):
+        while not bot.is_closed():
+            try:
+                await self.inventory.wait_ready()
+                container_ids = [entry["id"] for entry in self.inventory.running()]
+                self.latest = await asyncio.to_thread(self.sample_all, container_ids)
+                self.publish()
+            except DockerError as e:
+                print(f"❌ Error collecting container stats: {e}")
+            await asyncio.sleep(self.interval)
+
+
+class FleetStatsCollector(StatsCollector):
+    """Publishes the merged latest samples of every host's collector as one batch."""
+
+    def __init__(self, collectors, inventory, interval=STATS_INTERVAL):
+        # Samples live in the per-host collectors, so none of the streaming state is set up here
+        self.collectors = collectors
+        self.inventory = inventory
+        self.interval = interval
+        self.subscribers = []
+        self.task = None
+
+    @property
+    def latest(self):
+        merged = {}
+        for collector in self.collectors:
+            merged.update(collector.latest)
+        return merged
+
+    async def run(self):
+        while not bot.is_closed():
+            self.publish()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        for collector in self.collectors:
+            collector.start()
+        super().start()
+
+
+def build_stats_collector(name, host_inventory):
+    # The cgroup filesystem is only readable for the host the bot runs on, assumed to be the first one
+    if METRICS_BACKEND == "cgroup" and name == next(iter(DOCKER_HOSTS)):
+        return CgroupStatsCollector(host_inventory)
+    # Streams hold one connection each, so they get their own unbounded pool
+    return StatsCollector(DockerClient.from_config(DOCKER_HOSTS[name], pool_size=0), host_inventory)
+
+
+host_collectors = [build_stats_collector(name, host_inventory) for name, host_inventory in host_inventories.items()]
+stats_collector = FleetStatsCollector(host_collectors, inventory) if FLEET_MODE else host_collectors[0]
+
+
+class RollupRing:
+    """Fixed-size ring of per-slot min/max/sum/count for every metric at one resolution.
+
+    Slots are addressed by absolute slot number (timestamp // resolution) modulo the
+    capacity, so no timestamps are stored and memory never grows after construction.
+    """
+
+    def __init__(self, resolution, capacity, metrics=len(SERIES_METRICS)):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.metrics = metrics
+        self.mins = array("f", bytes(4 * capacity * metrics))
+        self.maxs = array("f", bytes(4 * capacity * metrics))
+        self.sums = array("f", bytes(4 * capacity * metrics))
+        self.counts = array("H", bytes(2 * capacity))
+        self.head = None  # Absolute slot number of the newest slot
+
+    def add(self, timestamp, values):
+        slot = int(timestamp // self.resolution)
+        if self.head is None:
+            self.head = slot
+        elif slot > self.head:
+            # Reset every slot we skipped over (at most one full lap)
+            for skipped in range(max(self.head + 1, slot - self.capacity + 1), slot + 1):
+                self.counts[skipped % self.capacity] = 0
+            self.head = slot
+        elif slot <= self.head - self.capacity:
+            return
+
+        index = slot % self.capacity
+        base = index * self.metrics
+        if self.counts[index] == 0:
+            for offset, value in enumerate(values):
+                self.mins[base + offset] = self.maxs[base + offset] = self.sums[base + offset] = value
+        else:
+            for offset, value in enumerate(values):
+                if value < self.mins[base + offset]:
+                    self.mins[base + offset] = value
+                if value > self.maxs[base + offset]:
+                    self.maxs[base + offset] = value
+                self.sums[base + offset] += value
+        self.counts[index] = min(self.counts[index] + 1, 65535)
+
+    def span(self):
+        return self.resolution * self.capacity
+
+    def window(self, since, metric):
+        """Return (slot start times, mins, maxs, avgs) for one metric over populated slots newer than `since`."""
+        times, mins, maxs, avgs = [], [], [], []
+        if self.head is None:
+            return times, mins, maxs, avgs
+        first = max(int(since // self.resolution), self.head - self.capacity + 1)
+        for slot in range(first, self.head + 1):
+            index = slot % self.capacity
+            count = self.counts[index]
+            if not count:
+                continue
+            position = index * self.metrics + metric
+            times.append(slot * self.resolution)
+            mins.append(self.mins[position])
+            maxs.append(self.maxs[position])
+            avgs.append(self.sums[position] / count)
+        return times, mins, maxs, avgs
+
+
+class MetricsStore:
+    """Per-container ring-buffer history of stats samples rolled up at 1 s, 1 min and 1 h."""
+
+    def __init__(self, tiers=SERIES_TIERS, max_series=MAX_SERIES):
+        self.tiers = tiers
+        self.max_series = max_series
+        self.series = {}  # container name -> {"rings", "counters", "updated"}
+
+    def record(self, sample):
+        name = sample["name"]
+        series = self.series.pop(name, None)
+        if series is None:
+            if len(self.series) >= self.max_series:
+                # Dicts keep insertion order and we re-insert on every update: the first key is the stalest
+                del self.series[next(iter(self.series))]
+            series = {"rings": [RollupRing(resolution, slots) for resolution, slots in self.tiers], "counters": None}
+        self.series[name] = series
+
+        timestamp = sample["timestamp"]
+        counters = (timestamp, sample["net_rx"], sample["net_tx"], sample["blk_read"], sample["blk_write"])
+        previous, series["counters"] = series["counters"], counters
+        if previous is None or timestamp <= previous[0]:
+            return
+        # IO counters are cumulative; store them as per-second rates (a restart resets them to zero)
+        elapsed = timestamp - previous[0]
+        rates = [max(current - before, 0) / elapsed for current, before in zip(counters[1:], previous[1:])]
+        values = (sample["cpu_percent"], sample["mem_usage"], *rates)
+        for ring in series["rings"]:
+            ring.add(timestamp, values)
+
+    def window(self, name, seconds, metric):
+        """Pick the finest tier covering the window and return its slots for one metric."""
+        series = self.series.get(name)
+        if series is None:
+            return None
+        rings = series["rings"]
+        ring = next((ring for ring in rings if ring.span() >= seconds), rings[-1])
+        return ring.resolution, ring.window(time.time() - seconds, SERIES_METRICS.index(metric))
+
+    def memory_bytes(self):
+        per_series = sum(slots * (len(SERIES_METRICS) * 12 + 2) for _, slots in self.tiers)
+        return per_series * len(self.series)
+
+
+metrics_store = MetricsStore()
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list."""
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+def sparkline(values, width=40):
+    """Render values as a unicode sparkline, averaging into at most `width` buckets."""
+    if not values:
+        return ""
+    bucket = max(len(values) / width, 1)
+    points = []
+    position = 0.0
+    while int(position) < len(values):
+        chunk = values[int(position):max(int(position + bucket), int(position) + 1)]
+        points.append(sum(chunk) / len(chunk))
+        position += bucket
+    low, high = min(points), max(points)
+    bars = "▁▂▃▄▅▆▇█"
+    if high == low:
+        return bars[0] * len(points)
+    return "".join(bars[int((point - low) / (high - low) * (len(bars) - 1))] for point in points)
+
+async def metrics_recorder():
+    """Record every published stats batch into the metrics store."""
+    samples_queue = stats_collector.subscribe()
+    while not bot.is_closed():
+        for sample in await samples_queue.get():
+            metrics_store.record(sample)
+
+
+# Metrics an alert rule can test, with how to display them. Any of them can be
+# suffixed with `_change` to test its rate of change per minute instead.
+ALERT_METRICS = {
+    "cpu": ("CPU Usage", lambda value: f"{value:.2f}%"),
+    "mem_percent": ("Memory (% of host)", lambda value: f"{value:.2f}%"),
+    "mem_limit_percent": ("Memory (% of limit)", lambda value: f"{value:.2f}%"),
+    "mem_usage": ("Memory Usage", format_binary_bytes),
+    "restart_rate": ("Restarts (last hour)", lambda value: f"{value:.0f}"),
+}
+DEFAULT_ALERT_RULES = [{"name": "High CPU", "metric": "cpu", "above": ALERT_THRESHOLD, "cooldown": 300}]
+
+
+class AlertRule:
+    """A configured alert: container selector, threshold condition, hysteresis and cooldown."""
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        selector = spec.get("selector", "*")
+        self.selectors = [selector] if isinstance(selector, str) else [*selector]
+        self.metric = spec["metric"]
+        self.base_metric = self.metric[:-len("_change")] if self.metric.endswith("_change") else self.metric
+        if self.base_metric not in ALERT_METRICS:
+            raise ValueError(f"Unknown metric `{self.metric}` in alert rule `{self.name}`")
+        self.above = self._threshold(spec["above"])
+        self.clear_below = self._threshold(spec.get("clear_below", spec["above"]))
+        self.for_samples = max(int(spec.get("for_samples", 1)), 1)
+        self.cooldown = spec.get("cooldown", 300)
+        self.notify_resolved = spec.get("notify_resolved", False)
+
+        self.selected = []  # Indices of matching containers in the engine's current columns
+        # Sparse state: only containers that are (or were just) over the threshold appear here
+        self.streaks = {}
+        self.active = set()
+        self.last_fired = {}
+
+    @staticmethod
+    def _threshold(value):
+        return float(parse_memory(value)) if isinstance(value, str) else float(value)
+
+    def matches(self, name):
+        return any(fnmatch.fnmatchcase(name, pattern) for pattern in self.selectors)
+
+    def format(self, value):
+        label, formatter = ALERT_METRICS[self.base_metric]
+        if self.metric != self.base_metric:
+            return f"{label} change", f"{'+' if value >= 0 else ''}{formatter(value)}/min"
+        return label, formatter(value)
+
+
+class AlertEngine:
+    """Evaluates every rule against every container per stats tick over columnar metric arrays.
+
+    Threshold tests run as a single C-level map/compress per rule; per-container Python
+    work is limited to the containers that are currently over a threshold.
+    """
+
+    def __init__(self, rules, inventory):
+        self.rules = rules
+        self.inventory = inventory
+        self.metrics = {rule.metric for rule in rules}
+        self.base_metrics = {rule.base_metric for rule in rules}
+        self.names = []
+        self.positions = {}  # container name -> index in the current columns
+        self.previous = None  # (timestamp, names, {base metric: column}) for *_change metrics
+        self.restart_counts = {}  # container name -> RestartCount last seen, kept while the container exists
+        self.restart_times = {}  # container name -> deque of restart times in the last hour
+        self.host_memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")  # Until a host reports MemTotal
+        self.host_memories = array("d")  # Memory of each container's own host, aligned with self.names
+
+    def _realign(self, column, names):
+        """Reorder a column computed for `names` to match the current container order."""
+        values = dict(zip(names, column))
+        return array("d", [values.get(name, 0.0) for name in self.names])
+
+    def _restart_column(self, samples, now):
+        # Counted from the inventory, not the samples: a crash-looping container is mostly not
+        # running, so it drops out of the stats samples between restarts
+        counts = {entry["name"]: entry["restart_count"] for entry in self.inventory.containers.values()}
+        for name, count in counts.items():
+            # A container seen for the first time starts from its current count so history is not counted as restarts
+            previous = self.restart_counts.get(name, count)
+            if count > previous:
+                self.restart_times.setdefault(name, deque()).extend([now] * (count - previous))
+        self.restart_counts = counts
+
+        rates = array("d", bytes(8 * len(samples)))
+        for name, times in [*self.restart_times.items()]:
+            while times and times[0] < now - 3600:
+                times.popleft()
+            if not times:
+                del self.restart_times[name]
+            elif name in self.positions:
+                rates[self.positions[name]] = len(times)
+        return rates
+
+    def columns(self, samples, now):
+        renamed = [sample["name"] for sample in samples] != self.names
+        if renamed:
+            self.names = [sample["name"] for sample in samples]
+            self.positions = {name: index for index, name in enumerate(self.names)}
+            for rule in self.rules:
+                rule.selected = [index for index, name in enumerate(self.names) if rule.matches(name)]
+            # In fleet mode every host has its own memory size
+            self.host_memories = array("d", [self.inventory.host_memory(sample["id"]) or self.host_memory for sample in samples])
+
+        columns = {}
+        for metric in self.base_metrics:
+            if metric == "cpu":
+                columns[metric] = array("d", [sample["cpu_percent"] for sample in samples])
+            elif metric == "mem_usage":
+                columns[metric] = array("d", [sample["mem_usage"] for sample in samples])
+            elif metric == "mem_percent":
+                columns[metric] = array("d", [sample["mem_usage"] * 100 / memory for sample, memory in zip(samples, self.host_memories)])
+            elif metric == "mem_limit_percent":
+                # Without an explicit limit Docker reports host memory, which is not a limit worth alerting on
+                columns[metric] = array("d", [sample["mem_percent"] if 0 < sample["mem_limit"] < memory else 0.0
+                                              for sample, memory in zip(samples, self.host_memories)])
+            else:
+                columns[metric] = self._restart_column(samples, now)
+
+        for metric in self.metrics - self.base_metrics:
+            base = metric[:-len("_change")]
+            if self.previous is None or now <= self.previous[0]:
+                columns[metric] = array("d", bytes(8 * len(samples)))
+                continue
+            then, names, previous_columns = self.previous
+            before = previous_columns[base] if names == self.names else self._realign(previous_columns[base], names)
+            per_minute = 60 / (now - then)
+            columns[metric] = array("d", map(per_minute.__mul__, map(operator.sub, columns[base], before)))
+        self.previous = (now, self.names, {metric: columns[metric] for metric in self.base_metrics})
+        return columns
+
+    def evaluate(self, samples):
+        """Return the alerts that fired or resolved on this tick."""
+        now = time.monotonic()
+        columns = self.columns(samples, now)
+        alerts = []
+        for rule in self.rules:
+            column = columns[rule.metric]
+            values = map(column.__getitem__, rule.selected)
+            over = [*map(self.names.__getitem__, compress(rule.selected, map(rule.above.__lt__, values)))]
+
+            # Sustained-for-N: streaks only survive while the container stays over the threshold
+            rule.streaks = {name: rule.streaks.get(name, 0) + 1 for name in over}
+            for name in over:
+                if rule.streaks[name] < rule.for_samples or name in rule.active:
+                    continue
+                if now - rule.last_fired.get(name, float("-inf")) < rule.cooldown:
+                    continue
+                rule.active.add(name)
+                rule.last_fired[name] = now
+                alerts.append({"rule": rule, "sample": samples[self.positions[name]], "value": column[self.positions[name]], "resolved": False})
+
+            # Hysteresis: an active alert only clears once the value drops below clear_below
+            for name in [name for name in rule.active if name not in rule.streaks]:
+                position = self.positions.get(name)
+                if position is None:
+                    rule.active.discard(name)
+                elif column[position] < rule.clear_below:
+                    rule.active.discard(name)
+                    if rule.notify_resolved:
+                        alerts.append({"rule": rule, "sample": samples[position], "value": column[position], "resolved": True})
+        return alerts
+
+
+alert_engine = AlertEngine([AlertRule(spec) for spec in config.get("alert_rules", DEFAULT_ALERT_RULES)], inventory)
+
+
+class WindowDetector:
+    """Fires when `count` events land within `window` seconds, in O(1) per event.
+
+    Only the last `count` timestamps are kept: the window is full exactly when the oldest
+    of them is recent enough. A firing detector clears after a quiet window.
+    """
+
+    def __init__(self, count, window):
+        self.window = window
+        self.times = deque(maxlen=count)
+        self.firing = False
+
+    def add(self, when):
+        """Record an event; True when this event starts a new firing period."""
+        self.times.append(when)
+        if self.firing or len(self.times) < self.times.maxlen or when - self.times[0] > self.window:
+            return False
+        self.firing = True
+        return True
+
+    def quiet(self, now):
+        """True once, when a firing detector has seen no event for a whole window."""
+        if self.firing and now - self.times[-1] > self.window:
+            self.firing = False
+            return True
+        return False
+
+
+class EventTimeline:
+    """Recent die/oom/restart/health events per container, fed by the inventory's events stream.
+
+    Each container keeps a bounded ring buffer for /events plus two window detectors for
+    crash loops (repeated dies) and flapping health; OOM kills alert on their own.
+    """
+
+    TRACKED = {"die", "oom", "restart"}
+
+    def __init__(self, history=EVENT_HISTORY, crash_loop=CRASH_LOOP, flapping=HEALTH_FLAPPING):
+        self.history = history
+        self.crash_loop = crash_loop
+        self.flapping = flapping
+        self.events = {}  # container name -> deque of (time, action, detail)
+        self.health = {}  # container name -> last health status seen
+        self.detectors = {}  # (container name, kind) -> WindowDetector
+        self.task = None
+
+    def _detector(self, name, kind):
+        detector = self.detectors.get((name, kind))
+        if detector is None:
+            spec = self.crash_loop if kind == "crash_loop" else self.flapping
+            detector = self.detectors[(name, kind)] = WindowDetector(spec["count"], spec["window"])
+        return detector
+
+    def record(self, host, event):
+        actor = event.get("Actor") or {}
+        attributes = actor.get("Attributes") or {}
+        action = event.get("Action", "")
+        if not attributes.get("name"):
+            return
+        name = f"{host}/{attributes['name']}" if host else attributes["name"]
+        when = event["timeNano"] / 1e9 if event.get("timeNano") else event.get("time", time.time())
+
+        if action.startswith("health_status"):
+            status = action.split(":", 1)[1].strip()
+            # The inventory has not applied this event yet, so it still holds the status before it
+            previous = self.health.get(name) or (inventory.get(name) or {}).get("health")
+            self.health[name] = status
+            if previous is None or previous == status:
+                return  # Only transitions go on the timeline
+            detail = f"{previous} → {status}"
+            action = "health_status"
+        elif action in self.TRACKED:
+            detail = f"exit code {attributes.get('exitCode', '?')}" if action == "die" else ""
+        else:
+            return
+
+        timeline = self.events.get(name)
+        if timeline is None:
+            timeline = self.events[name] = deque(maxlen=self.history)
+        timeline.append((when, action, detail))
+
+        if action == "oom":
+            self.alert(name, "Out of memory", "The kernel OOM-killed a process in this container.")
+        elif action == "die" and self._detector(name, "crash_loop").add(when):
+            self.alert(name, "Crash loop", f"Died {self.crash_loop['count']} times within {human_duration(self.crash_loop['window']).lower()} (last: {detail}).")
+        elif action == "health_status" and self._detector(name, "flapping").add(when):
+            self.alert(name, "Health flapping", f"Health changed {self.flapping['count']} times within {human_duration(self.flapping['window']).lower()} (now `{status}`).")
+
+    def alert(self, name, title, description, resolved=False):
+        channel = bot.get_channel(ALERT_CHANNEL_ID) if ALERT_CHANNEL_ID else None
+        if channel is None:
+            return
+        embed = discord.Embed(
+            title=f"✅ **Resolved {title}: `{name}`**" if resolved else f"🚨 **{title}: `{name}`**",
+            description=description,
+            color=discord.Colour.green() if resolved else discord.Colour.red(),
+        )
+        embed.set_footer(text=get_current_time())
+        outbound.send(channel, embed=embed, priority=PRIORITY_ALERT)
+
+    def window(self, name, seconds):
+        since = time.time() - seconds
+        return [event for event in self.events.get(name, ()) if event[0] >= since]
+
+    async def run(self):
+        """Resolve detectors that went quiet and forget containers that have been silent for a day."""
+        while not bot.is_closed():
+            await asyncio.sleep(30)
+            now = time.time()
+            for (name, kind), detector in [*self.detectors.items()]:
+                if detector.quiet(now):
+                    self.alert(name, "Crash loop" if kind == "crash_loop" else "Health flapping",
+                               f"No further events for {human_duration(detector.window).lower()}.", resolved=True)
+                if not detector.firing and now - detector.times[-1] > 86400:
+                    del self.detectors[(name, kind)]
+            for name, timeline in [*self.events.items()]:
+                if now - timeline[-1][0] > 86400 and inventory.get(name) is None:
+                    del self.events[name]
+                    self.health.pop(name, None)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = bot.loop.create_task(self.run())
+
+
+event_timeline = EventTimeline()
+
+
+PRIORITY_ALERT, PRIORITY_NORMAL, PRIORITY_LOG = range(3)
+
+
+class TokenBucket:
+    """Client-side mirror of a Discord rate-limit bucket (`rate` requests per `per` seconds)."""
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # Set from Retry-After when Discord answers 429 anyway
+
+    def delay(self):
+        """Seconds to wait before a token is available (0 if one can be taken now)."""
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.per / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class ChannelQueue:
+    """Pending outbound messages of one channel, one deque per priority."""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.items = (deque(), deque(), deque())  # Alerts, normal messages, log lines
+        self.bucket = TokenBucket(5, 5.0)  # POST /channels/{id}/messages
+        self.dropped = 0  # Log lines dropped since the last log message went out
+        self.retry = None  # Payload that hit a 429 and goes out first once the bucket reopens
+        self.task = None
+
+    def depth(self):
+        return sum(len(items) for items in self.items) + (self.retry is not None)
+
+
+class OutboundScheduler:
+    """Central per-channel outbound queue: alerts go first, log lines are coalesced and shed under backlog."""
+
+    def __init__(self, max_log_backlog=OUTBOUND_LOG_BACKLOG):
+        self.max_log_backlog = max_log_backlog
+        self.queues = {}  # channel id -> ChannelQueue
+        self.global_bucket = TokenBucket(45, 1.0)  # Stay under the 50 requests/s global limit
+        self.sent = 0
+        self.dropped = 0
+        self.rate_limited = 0  # 429 responses from Discord, including the ones py-cord retried itself
+        self.throttled = 0  # Sends we delayed to stay inside a bucket
+
+    def _queue(self, channel):
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            queue = self.queues[channel.id] = ChannelQueue(channel)
+        if queue.task is None or queue.task.done():
+            queue.task = asyncio.create_task(self._worker(queue))
+        return queue
+
+    def send(self, channel, content=None, *, priority=PRIORITY_NORMAL, **kwargs):
+        """Queue a message; the returned future resolves to the sent message (or None on failure)."""
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queue(channel)
+        queue.items[priority].append((dict(kwargs, content=content), future))
+        return future
+
+    def send_log(self, channel, text):
+        """Queue log output; consecutive lines are merged into as few code-block messages as possible."""
+        queue = self._queue(channel)
+        lines = queue.items[PRIORITY_LOG]
+        for line in text.split("\n"):
+            # Lines longer than one message are split up front so every item fits
+            for start in range(0, max(len(line), 1), MAX_MESSAGE_LENGTH):
+                lines.append(line[start:start + MAX_MESSAGE_LENGTH])
+        overflow = len(lines) - self.max_log_backlog
+        for _ in range(max(overflow, 0)):
+            lines.popleft()
+        if overflow > 0:
+            queue.dropped += overflow
+            self.dropped += overflow
+
+    def log_backlog(self, channel):
+        """Number of log lines still waiting to go out to a channel."""
+        queue = self.queues.get(channel.id)
+        return len(queue.items[PRIORITY_LOG]) if queue else 0
+
+    def _next(self, queue):
+        """Pop the next payload: the highest priority item, or a batch of coalesced log lines."""
+        if queue.retry is not None:
+            retry, queue.retry = queue.retry, None
+            return retry
+        for priority in (PRIORITY_ALERT, PRIORITY_NORMAL):
+            if queue.items[priority]:
+                return queue.items[priority].popleft()
+        lines = queue.items[PRIORITY_LOG]
+        batch = []
+        size = 0
+        if queue.dropped:
+            batch.append(f"... skipped {queue.dropped} lines (outbound backlog full) ...")
+            size = len(batch[0]) + 1
+            queue.dropped = 0
+        while lines and size + len(lines[0]) + 1 <= MAX_MESSAGE_LENGTH:
+            line = lines.popleft()
+            batch.append(line)
+            size += len(line) + 1
+        return {"content": f"```{chr(10).join(batch)}```"}, None
+
+    async def _worker(self, queue):
+        while queue.depth():
+            delay = max(queue.bucket.delay(), self.global_bucket.delay())
+            if delay:
+                self.throttled += 1
+                await asyncio.sleep(delay)
+                continue
+            queue.bucket.take()
+            self.global_bucket.take()
+
+            payload, future = self._next(queue)
+            try:
+                message = await queue.channel.send(**payload)
+                self.sent += 1
+            except discord.HTTPException as e:
+                message = None
+                if e.status == 429:
+                    # py-cord retries 429s itself and gives up only after logging them (see RateLimitMonitor)
+                    retry_after = float(e.response.headers.get("Retry-After", 1))
+                    queue.bucket.blocked_until = time.monotonic() + retry_after
+                    queue.retry = (payload, future)
+                    continue
+                else:
+                    print(f"❌ Error sending message to channel {queue.channel.id}: {e}")
+            if future is not None and not future.done():
+                future.set_result(message)
+
+    def observe_rate_limit(self, bucket, retry_after):
+        """Record a 429 and, for a channel's message route, slow that queue down to Discord's real bucket."""
+        self.rate_limited += 1
+        channel_id, _, path = bucket.split(":", 2)
+        queue = self.queues.get(int(channel_id)) if channel_id.isdigit() else None
+        if queue is not None and path == "/channels/{channel_id}/messages":
+            queue.bucket.blocked_until = time.monotonic() + retry_after
+            queue.bucket.rate = max(queue.bucket.rate - 1, 1)
+
+    def stats(self):
+        return {
+            "depth": sum(queue.depth() for queue in self.queues.values()),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "rate_limited": self.rate_limited,
+            "throttled": self.throttled,
+        }
+
+
+outbound = OutboundScheduler()
+
+
+class RateLimitMonitor(logging.Filter):
+    """Feeds the 429s py-cord handles internally to the outbound queue.
+
+    py-cord sleeps and retries a 429 inside the request, so channel.send() never sees it;
+    it does log each one, with the retry delay and the route bucket. As a filter rather
+    than a handler it leaves py-cord's own logging output unchanged.
+    """
+
+    def filter(self, record):
+        if record.msg.startswith("We are being rate limited"):
+            retry_after, bucket = record.args
+            outbound.observe_rate_limit(bucket, retry_after)
+        elif record.msg.startswith("Global rate limit has been hit"):
+            outbound.global_bucket.blocked_until = time.monotonic() + record.args[0]
+        return True
+
+
+logging.getLogger("discord.http").addFilter(RateLimitMonitor())
+
+
+class Dashboards:
+    """Pinned per-channel status messages, all edited in place from one shared snapshot.
+
+    Each stats tick renders a single embed; a dashboard is only edited when that
+    rendering differs from what it last showed, and at most once per interval.
+    """
+
+    def __init__(self, inventory, collector, path=DASHBOARD_FILE, interval=DASHBOARD_INTERVAL):
+        self.inventory = inventory
+        self.collector = collector
+        self.path = path
+        self.interval = interval
+        self.messages = {}  # channel id -> message id
+        self.shown = {}  # channel id -> digest of the content last shown
+        self.edited_at = {}  # channel id -> monotonic time of the last edit
+        self.edits = 0
+        self.task = None
+        try:
+            with open(path, "r") as file:
+                self.messages = {int(channel_id): message_id for channel_id, message_id in json.load(file).items()}
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def _save(self):
+        with open(self.path, "w") as file:
+            json.dump(self.messages, file)
+
+    def render(self, samples):
+        """Build the shared dashboard embed and a digest of everything except the timestamp."""
+        stats = {sample["id"]: sample for sample in samples}
+        entries = sorted(self.inventory.containers.values(), key=lambda entry: entry["name"])
+        running = sum(entry["status"] == "running" for entry in entries)
+        unhealthy = sum(entry["health"] == "unhealthy" for entry in entries)
+
+        rows = [f"{'CONTAINER':<24}{'STATE':<16}{'CPU':>6}{'MEM':>12}"]
+        for entry in entries[:DASHBOARD_ROWS]:
+            state = entry["status"] if entry["status"] != "exited" else f"exited ({entry['exit_code']})"
+            if entry["health"]:
+                state = f"{state[:7]} {entry['health'][:8]}"
+            sample = stats.get(entry["id"])
+            # Coarse rounding keeps small fluctuations from counting as a change
+            cpu = f"{sample['cpu_percent']:.0f}%" if sample else "-"
+            memory = format_binary_bytes(round(sample["mem_usage"], -6)) if sample else "-"
+            rows.append(f"{entry['name'][:23]:<24}{state[:15]:<16}{cpu:>6}{memory:>12}")
+        if len(entries) > DASHBOARD_ROWS:
+            rows.append(f"... and {len(entries) - DASHBOARD_ROWS} more")
+        table = "\n".join(rows)
+        if len(table) > 4000:
+            table = table[:4000].rsplit("\n", 1)[0]
+
+        summary = f"🟢 Running: `{running}` · 📦 Total: `{len(entries)}` · {'🔴' if unhealthy else '💚'} Unhealthy: `{unhealthy}`"
+        digest = hash((summary, table))
+        embed = discord.Embed(title="📊 Docker Dashboard", description=f"```{table}```", color=discord.Colour.red() if unhealthy else discord.Colour.blue())
+        embed.add_field(name="Summary", value=summary, inline=False)
+        embed.set_footer(text=f"Last changed {get_current_time()}")
+        return embed, digest
+
+    async def create(self, channel):
+        """Post and pin a new dashboard for a channel, replacing any existing one."""
+        await self.remove(channel)
+        embed, digest = self.render(self.collector.samples())
+        message = await channel.send(embed=embed)
+        try:
+            await message.pin()
+        except discord.HTTPException as e:
+            print(f"⚠️ Could not pin dashboard in channel {channel.id}: {e}")
+        self.messages[channel.id] = message.id
+        self.shown[channel.id] = digest
+        self.edited_at[channel.id] = time.monotonic()
+        await asyncio.to_thread(self._save)
+
+    async def remove(self, channel):
+        """Stop updating a channel's dashboard and unpin it; returns False if there was none."""
+        message_id = self.messages.pop(channel.id, None)
+        self.shown.pop(channel.id, None)
+        self.edited_at.pop(channel.id, None)
+        if message_id is None:
+            return False
+        with contextlib.suppress(discord.HTTPException):
+            await channel.get_partial_message(message_id).unpin()
+        await asyncio.to_thread(self._save)
+        return True
+
+    async def _edit(self, channel_id, embed, digest):
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            return
+        delay = outbound.global_bucket.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        outbound.global_bucket.take()
+        try:
+            await channel.get_partial_message(self.messages[channel_id]).edit(embed=embed)
+            self.edits += 1
+            self.shown[channel_id] = digest
+            self.edited_at[channel_id] = time.monotonic()
+        except discord.NotFound:
+            # Dashboard message was deleted by hand
+            self.messages.pop(channel_id, None)
+            await asyncio.to_thread(self._save)
+        except discord.HTTPException as e:
+            print(f"❌ Error updating dashboard in channel {channel_id}: {e}")
+
+    async def run(self):
+        updates = self.collector.subscribe()
+        while not bot.is_closed():
+            samples = await updates.get()
+            if not self.messages:
+                continue
+            now = time.monotonic()
+            due = [channel_id for channel_id in self.messages if now - self.edited_at.get(channel_id, 0) >= self.interval]
+            if not due:
+                continue
+            embed, digest = self.render(samples)
+            for channel_id in due:
+                if self.shown.get(channel_id) != digest and channel_id in self.messages:
+                    await self._edit(channel_id, embed, digest)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = bot.loop.create_task(self.run())
+
+
+dashboards = Dashboards(inventory, stats_collector)
+
+
+def render_gauge(name, kind, help, labels, rows):
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} {kind}"
+    for values, value in rows:
+        yield f"{name}{format_labels(labels, values)} {value}"
+
+
+class LoopWatchdog:
+    """Background thread that notices when the event loop stops turning and logs the stack blocking it.
+
+    The loop lag probe calls beat() every LOOP_LAG_INTERVAL. While the loop is blocked the
+    heartbeat goes stale, and the watchdog thread (which does not need the loop) reads the
+    loop thread's current frame.
+    """
+
+    def __init__(self, threshold=LOOP_LAG_THRESHOLD):
+        self.threshold = threshold
+        self.heartbeat = time.monotonic()
+        self.loop_thread = None
+        self.thread = None
+        self.stalls = 0
+
+    def beat(self):
+        self.heartbeat = time.monotonic()
+
+    def _watch(self):
+        stalled_since = None
+        while True:
+            time.sleep(min(self.threshold / 4, 0.25))
+            late = time.monotonic() - self.heartbeat - LOOP_LAG_INTERVAL
+            if late < self.threshold:
+                if stalled_since is not None:
+                    print(f"✅ Event loop recovered after a {self.heartbeat - stalled_since - LOOP_LAG_INTERVAL:.2f}s stall")
+                    stalled_since = None
+                continue
+            if stalled_since is None:
+                stalled_since = self.heartbeat
+                self.stalls += 1
+                frame = sys._current_frames().get(self.loop_thread)
+                stack = "".join(traceback.format_stack(frame)) if frame else "  <loop thread not found>\n"
+                print(f"⚠️ Event loop blocked for {late:.2f}s, currently running:\n{stack}", end="")
+
+    def start(self):
+        if self.thread is None:
+            self.loop_thread = threading.get_ident()
+            self.heartbeat = time.monotonic()
+            self.thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self.thread.start()
+
+
+def sample_stacks(thread_id, seconds, interval=PROFILE_SAMPLE_INTERVAL):
+    """Sample one thread's stack for a while; returns collapsed stacks (root;...;leaf -> count)."""
+    stacks = {}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        if frames:
+            stack = ";".join(reversed(frames))
+            stacks[stack] = stacks.get(stack, 0) + 1
+        time.sleep(interval)
+    return stacks
+
+
+loop_watchdog = LoopWatchdog()
+
+
+class MetricsExporter:
+    """Optional Prometheus /metrics endpoint and event loop lag probe, both running on the bot's own loop."""
+
+    def __init__(self, host=METRICS_HOST, port=METRICS_PORT):
+        self.host = host
+        self.port = port
+        self.runner = None
+        self.task = None
+
+    async def probe_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while not bot.is_closed():
+            expected = loop.time() + LOOP_LAG_INTERVAL
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            loop_lag.observe(max(loop.time() - expected, 0))
+            loop_watchdog.beat()
+
+    def render(self):
+        """Text exposition of every metric; gauges are read from live state at scrape time."""
+        queue = outbound.stats()
+        samples = stats_collector.samples()
+        container = ("container",)
+        states = {}
+        for entry in inventory.containers.values():
+            states[entry["status"]] = states.get(entry["status"], 0) + 1
+        lines = []
+        for metric in (command_latency, docker_latency, docker_errors, loop_lag):
+            lines.extend(metric.render())
+        for name, kind, help, labels, rows in (
+            ("guardian_startup_seconds", "gauge", "Seconds from process start to the bot being ready.", (),
+             [((), round(startup.ready_after, 3))] if startup.ready_after is not None else []),
+            ("guardian_event_loop_stalls_total", "counter", "Times the loop stalled past loop_lag_threshold.", (), [((), loop_watchdog.stalls)]),
+            ("guardian_outbound_queue_depth", "gauge", "Messages waiting in the outbound Discord queues.", (), [((), queue["depth"])]),
+            ("guardian_outbound_sent_total", "counter", "Messages sent through the outbound queues.", (), [((), queue["sent"])]),
+            ("guardian_outbound_rate_limited_total", "counter", "429 responses received from Discord.", (), [((), queue["rate_limited"])]),
+            ("guardian_outbound_dropped_total", "counter", "Log lines dropped because an outbound backlog was full.", (), [((), queue["dropped"])]),
+            ("guardian_follow_streams", "gauge", "Upstream container log streams shared by /follow.", (), [((), len(log_followers))]),
+            ("guardian_follow_subscribers", "gauge", "Users following container logs.", (), [((), len(active_log_streams))]),
+            ("guardian_containers", "gauge", "Containers known to the inventory by state.", ("state",),
+             [((state,), count) for state, count in sorted(states.items())]),
+            ("guardian_container_cpu_percent", "gauge", "Container CPU usage (100 = one core).", container,
+             [((sample["name"],), round(sample["cpu_percent"], 3)) for sample in samples]),
+            ("guardian_container_memory_usage_bytes", "gauge", "Container memory usage excluding page cache.", container,
+             [((sample["name"],), sample["mem_usage"]) for sample in samples]),
+            ("guardian_container_memory_limit_bytes", "gauge", "Container memory limit.", container,
+             [((sample["name"],), sample["mem_limit"]) for sample in samples]),
+        ):
+            lines.extend(render_gauge(name, kind, help, labels, rows))
+        return "\n".join(lines) + "\n"
+
+    async def handle(self, request):
+        return web.Response(body=self.render().encode(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def serve(self):
+        try:
+            await self.runner.setup()
+            await web.TCPSite(self.runner, self.host, self.port).start()
+            print(f"✅ Serving Prometheus metrics on http://{self.host}:{self.port}/metrics")
+        except OSError as e:
+            print(f"❌ Could not start the metrics endpoint: {e}")
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = bot.loop.create_task(self.probe_loop_lag())
+            loop_watchdog.start()
+        if self.port and self.runner is None:
+            app = web.Application()
+            app.router.add_get("/metrics", self.handle)
+            self.runner = web.AppRunner(app, access_log=None)
+            bot.loop.create_task(self.serve())
+
+
+metrics_exporter = MetricsExporter()
+
+
+def build_activity():
+    activity_type = config["status"]["type"]
+    activity_message = config["status"]["message"]
+
+    if activity_type == "playing":
+        return discord.Game(name=activity_message)
+    elif activity_type == "listening":
+        return discord.Activity(type=discord.ActivityType.listening, name=activity_message, assets={"large_image": "embedded_background"} )
+    elif activity_type == "watching":
+        return discord.Activity(type=discord.ActivityType.watching, name=activity_message)
+    return None
+
+# Sent with every IDENTIFY, so the presence is in place on connect without a separate update
+bot.activity = build_activity()
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class StartupState:
+    """Hashes of the profile and command tree last pushed to Discord, so restarts only push what changed.
+
+    Hashes are kept per bot user, so switching tokens pushes everything again.
+    """
+
+    def __init__(self, path=STARTUP_STATE_FILE):
+        self.path = path
+        self.hashes = {}
+        self.ready_after = None  # Seconds from process start to the first on_ready
+        self.started = False
+        try:
+            with open(path, "r") as file:
+                self.hashes = json.load(file)
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def changed(self, key, digest):
+        return self.hashes.get(str(bot.user.id), {}).get(key) != digest
+
+    def record(self, key, digest):
+        self.hashes.setdefault(str(bot.user.id), {})[key] = digest
+        with open(self.path, "w") as file:
+            json.dump(self.hashes, file)
+
+
+startup = StartupState()
+
+
+def command_tree_hash():
+    commands = []
+    for command in bot.pending_application_commands:
+        data = command.to_dict()
+        for key in ("contexts", "integration_types"):  # Built from sets, so their order changes between runs
+            if key in data:
+                data[key] = sorted(data[key])
+        commands.append(data)
+    commands.sort(key=lambda data: data["name"])
+    return content_hash(json.dumps(commands, sort_keys=True, default=str).encode())
+
+
+async def sync_profile():
+    """Push the bot name, avatar and slash commands, skipping whatever Discord already has."""
+    pushed = []
     # Change bot username (limited to twice per hour)
     desired_name = config["bot_name"]
 
     if bot.user.name != desired_name:
         try:
             await bot.user.edit(username=desired_name)
+            pushed.append("name")
             print(f"✅ Changed bot name to {desired_name}")
         except discord.errors.HTTPException:
             print("❌ Rate limit reached! Can't change username right now.")
 
     # Change bot avatar
-    with open("avatar.png", "rb") as avatar_file:
-        avatar_bytes = avatar_file.read()
+    try:
+        with open("avatar.png", "rb") as avatar_file:
+            avatar_bytes = avatar_file.read()
+    except FileNotFoundError:
+        avatar_bytes = None
+    if avatar_bytes and startup.changed("avatar", content_hash(avatar_bytes)):
         try:
             await bot.user.edit(avatar=avatar_bytes)
+            startup.record("avatar", content_hash(avatar_bytes))
+            pushed.append("avatar")
             print("✅ Changed bot avatar successfully!")
         except discord.errors.HTTPException:
             print("❌ Rate limit reached! Can't change avatar right now.")
 
-    # Set bot status
-    activity_type = config["status"]["type"]
-    activity_message = config["status"]["message"]
-
-    if activity_type == "playing":
-        activity = discord.Game(name=activity_message)
-    elif activity_type == "listening":
-        activity = discord.Activity(type=discord.ActivityType.listening, name=activity_message, assets={"large_image": "embedded_background"} )
-    elif activity_type == "watching":
-        activity = discord.Activity(type=discord.ActivityType.watching, name=activity_message)
-    else:
-        activity = None
+    digest = command_tree_hash()
+    if startup.changed("commands", digest):
+        try:
+            await bot.sync_commands()
+            startup.record("commands", digest)
+            pushed.append("commands")
+        except discord.errors.Forbidden as e:
+            print("\n⚠️  Warning: Could not sync commands - Missing permissions")
+            print("\nTo fix this, please:")
+            print("1. Remove the bot from your server")
+            print(f"2. Reinvite using this link: https://discord.com/api/oauth2/authorize?client_id={bot.user.id}&permissions=2147483648&scope=bot%20applications.commands")
+            print("\nThe bot will continue to run, but slash commands may not work properly until this is fixed.\n")
+        except Exception as e:
+            print(f"\n⚠️  Error syncing commands: {e}\n")
+
+    print(f"✅ Profile sync: {'updated ' + ', '.join(pushed) if pushed else 'nothing changed'}")
 
-    await bot.change_presence(activity=activity)
-    print("✅ Bot is online and monitoring Docker!")
+@bot.event
+async def on_ready():
+    # on_ready fires again after every reconnect; workers and the profile sync only run the first time
+    if startup.started:
+        print("🔁 Reconnected to Discord.")
+        return
+    startup.started = True
+
+    audit_store.start()
+    authorization.start()
+    inventory.start()
+    stats_collector.start()
+    event_timeline.start()
+    log_analyzer.start()
+    log_archiver.start()
+    for model in disk_usage.values():
+        model.refresh()
+    dashboards.start()
+    metrics_exporter.start()
+    bot.loop.create_task(metrics_recorder())
     bot.loop.create_task(alert_monitor())
+    startup.ready_after = time.monotonic() - PROCESS_STARTED
+    print(f"✅ Bot is online and monitoring Docker! Ready in {startup.ready_after:.1f}s")
+    # Profile edits can sit behind long rate limits, so they never hold up readiness
+    bot.loop.create_task(sync_profile())
+
+command_started = {}  # interaction id -> monotonic time the command was received
+
+@bot.listen("on_application_command")
+async def track_command_start(ctx):
+    command_started[ctx.interaction.id] = time.monotonic()
+
+def observe_command(ctx, outcome):
+    started = command_started.pop(ctx.interaction.id, None)
+    if started is not None:
+        command_latency.observe(time.monotonic() - started, ctx.command.qualified_name, outcome)
+
+@bot.listen("on_application_command_completion")
+async def track_command_completion(ctx):
+    observe_command(ctx, "ok")
+
+@bot.listen("on_application_command_error")
+async def track_command_error(ctx, error):
+    observe_command(ctx, "error")
+    # A listener replaces py-cord's default handler, so keep printing the traceback
+    print(f"Ignoring exception in command {ctx.command}:", file=sys.stderr)
+    traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
 
 
 # Docker Management Commands Group
@@ -139,24 +2805,14 @@ docker_management = bot.create_group("docker", "Manage Docker containers")
 async def add(ctx, role: discord.Option(str, choices=["dev", "admin"]), user: discord.Member):
     user_id = user.id
 
-    with open("config/config.json", "r") as file:
-        config = json.load(file)
-
-    if ctx.author.id not in config["admins"]:
+    if not authorization.is_admin(ctx.author.id):
         await ctx.respond("❌ Only Admins can use this command.")
         return
 
-    if role == "dev" and user_id not in config["devs"]:
-        config["devs"].append(user_id)
-    elif role == "admin" and user_id not in config["admins"]:
-        config["admins"].append(user_id)
-    else:
+    if not await authorization.update_role("add", role, user_id):
         await ctx.respond(f"✅ `{user.name}` is already a {role}.")
         return
 
-    with open("config/config.json", "w") as file:
-        json.dump(config, file, indent=4)
-
     # Log the role change
     log_role_change("add", role, user_id, ctx.author.id)
 
@@ -166,24 +2822,14 @@ async def add(ctx, role: discord.Option(str, choices=["dev", "admin"]), user: di
 async def remove(ctx, role: discord.Option(str, choices=["dev", "admin"]), user: discord.Member):
     user_id = user.id
 
-    with open("config/config.json", "r") as file:
-        config = json.load(file)
-
-    if ctx.author.id not in config["admins"]:
+    if not authorization.is_admin(ctx.author.id):
         await ctx.respond("❌ Only Admins can use this command.")
         return
 
-    if role == "dev" and user_id in config["devs"]:
-        config["devs"].remove(user_id)
-    elif role == "admin" and user_id in config["admins"]:
-        config["admins"].remove(user_id)
-    else:
+    if not await authorization.update_role("remove", role, user_id):
         await ctx.respond(f"⚠️ `{user.name}` is not a {role}.")
         return
 
-    with open("config/config.json", "w") as file:
-        json.dump(config, file, indent=4)
-
     # Log the role change
     log_role_change("remove", role, user_id, ctx.author.id)
 
@@ -191,8 +2837,8 @@ async def remove(ctx, role: discord.Option(str, choices=["dev", "admin"]), user:
 
 @docker_management.command(description="Execute Docker container management commands.")
 async def execute(ctx, action: discord.Option(str, choices=['start', 'stop', 'restart', 'pause', 'unpause', 'delete']), 
-                 container_name: discord.Option(str, autocomplete=discord.utils.basic_autocomplete(get_container_names))):
-    if ctx.author.id not in config["allowed_user_ids"]:
+                 container_name: discord.Option(str, autocomplete=get_container_names)):
+    if not authorization.is_allowed(ctx.author.id):
         await ctx.respond("You are not authorized to use this bot.")
         return
     role = await check_permissions(ctx, "admin")
@@ -203,21 +2849,22 @@ async def execute(ctx, action: discord.Option(str, choices=['start', 'stop', 're
 
     try:
         await ctx.defer()
-        action = shlex.quote(action.lower())
-        container_name = shlex.quote(container_name)
+        action = action.lower()
         
         response = ""
 
-        if action == "delete":
-            container_status = subprocess.check_output(['docker', 'inspect', '-f', '{{.State.Status}}', container_name], text=True).strip()
-            if container_status == 'running':
-                await ctx.respond(f"Container `{container_name}` is still running. Please stop it before attempting to delete.")
-                return
-            subprocess.check_output(['docker', 'rm', container_name])
-            response = f"Container `{container_name}` has been deleted."
-        else:
-            subprocess.check_output(['docker', action, container_name])
-            response = f"Container `{container_name}` has been {action}ed."
+        client, name = resolve_container(container_name)
+        async with operations.slot(ctx.author.id):
+            if action == "delete":
+                container_status = (await client.inspect(name))["State"]["Status"]
+                if container_status == 'running':
+                    await ctx.respond(f"Container `{container_name}` is still running. Please stop it before attempting to delete.")
+                    return
+                await client.remove_container(name)
+                response = f"Container `{container_name}` has been deleted."
+            else:
+                await client.container_action(name, action)
+                response = f"Container `{container_name}` has been {action}ed."
 
         embed = discord.Embed(
             title="**__Docker Management__**",
@@ -227,12 +2874,101 @@ async def execute(ctx, action: discord.Option(str, choices=['start', 'stop', 're
         embed.set_footer(text=get_current_time())
         await ctx.respond(embed=embed)
 
-    except subprocess.CalledProcessError as e:
+    except DockerError as e:
+        await ctx.respond(f"Error executing Docker command: {e}")
+
+BULK_ACTIONS = {"start": "started", "stop": "stopped", "restart": "restarted", "pause": "paused", "unpause": "unpaused", "delete": "deleted"}
+
+def render_bulk_progress(action, selector, progress, finished):
+    """Build the /docker bulk embed, listing failures and in-flight containers before successes."""
+    counts = {"✅": 0, "❌": 0, "🔄": 0, "⏳": 0}
+    for icon, _ in progress.values():
+        counts[icon] += 1
+    order = {"❌": 0, "🔄": 1, "⏳": 2, "✅": 3}
+    lines = []
+    length = 0
+    items = sorted(progress.items(), key=lambda item: order[item[1][0]])
+    for index, (name, (icon, detail)) in enumerate(items):
+        line = f"{icon} `{name}` {detail}"
+        if length + len(line) > 3800:  # Embed descriptions are capped at 4096 characters
+            lines.append(f"… and {len(items) - index} more")
+            break
+        lines.append(line)
+        length += len(line) + 1
+
+    embed = discord.Embed(
+        title=f"**__Bulk {action}: `{selector}`__**",
+        description="\n".join(lines),
+        color=(discord.Colour.red() if counts["❌"] else discord.Colour.green()) if finished else discord.Colour.blurple(),
+    )
+    embed.add_field(name="Progress", value=f"✅ `{counts['✅']}` · ❌ `{counts['❌']}` · 🔄 `{counts['🔄']}` · ⏳ `{counts['⏳']}`", inline=False)
+    embed.set_footer(text=get_current_time())
+    return embed
+
+@docker_management.command(description="Run a container action on every container matching a selector.")
+async def bulk(ctx, action: discord.Option(str, choices=[*BULK_ACTIONS]),
+               selector: discord.Option(str, description="Name glob (web-*), label:key=value or project:name")):
+    if not authorization.is_allowed(ctx.author.id):
+        await ctx.respond("You are not authorized to use this bot.")
+        return
+    role = await check_permissions(ctx, "admin")
+    if not role:
+        return
+
+    log_command(ctx.author.id, ctx.author.name, "bulk", {"action": action, "selector": selector})
+
+    await ctx.defer()
+    try:
+        await inventory.wait_ready()
+    except DockerError as e:
+        await ctx.respond(f"Error executing Docker command: {e}")
+        return
+    targets = [entry["name"] for entry in inventory.select(selector)]
+    if not targets:
+        await ctx.respond(f"No containers match `{selector}`.")
+        return
+
+    progress = {name: ("⏳", "queued") for name in targets}
+    changed = asyncio.Event()
+    semaphore = asyncio.Semaphore(BULK_PARALLELISM)
+
+    async def run_one(name):
+        async with semaphore:
+            progress[name] = ("🔄", "in progress")
+            changed.set()
+            started = time.monotonic()
+            try:
+                client, container = resolve_container(name)
+                if action == "delete":
+                    # Same rule as /docker execute: containers must be stopped before they are deleted
+                    if (await client.inspect(container))["State"]["Status"] == "running":
+                        raise DockerError("still running, stop it before deleting")
+                    await client.remove_container(container)
+                else:
+                    await client.container_action(container, action)
+                progress[name] = ("✅", f"{BULK_ACTIONS[action]} in {time.monotonic() - started:.1f}s")
+            except DockerError as e:
+                progress[name] = ("❌", f"failed after {time.monotonic() - started:.1f}s: {e}")
+            changed.set()
+
+    try:
+        async with operations.slot(ctx.author.id):
+            message = await ctx.respond(embed=render_bulk_progress(action, selector, progress, False))
+            work = asyncio.gather(*map(run_one, targets))
+            # Edit the progress message at most once per interval, and only when something changed
+            while not work.done():
+                await asyncio.wait([work], timeout=BULK_EDIT_INTERVAL)
+                if changed.is_set() and not work.done():
+                    changed.clear()
+                    with contextlib.suppress(discord.HTTPException):
+                        await message.edit(embed=render_bulk_progress(action, selector, progress, False))
+            await message.edit(embed=render_bulk_progress(action, selector, progress, True))
+    except DockerError as e:
         await ctx.respond(f"Error executing Docker command: {e}")
         
 @bot.slash_command(description="View the role change audit log.")
 async def audit_roles(ctx):
-    if ctx.author.id not in config["admins"]:
+    if not authorization.is_admin(ctx.author.id):
         await ctx.respond("❌ Only Admins can view role change logs.")
         return
 
@@ -257,11 +2993,8 @@ async def audit_roles(ctx):
 
 @bot.slash_command(description="View current Admins and Devs.")
 async def roles(ctx):
-    with open("config/config.json", "r") as file:
-        config = json.load(file)
-
-    admins = [f"<@{id}>" for id in config["admins"]]
-    devs = [f"<@{id}>" for id in config["devs"]]
+    admins = [f"<@{id}>" for id in sorted(authorization.admins)]
+    devs = [f"<@{id}>" for id in sorted(authorization.devs)]
 
     embed = discord.Embed(title="🔹 User Roles", color=discord.Colour.blue())
     embed.add_field(name="👑 Admins", value=", ".join(admins) if admins else "None", inline=False)
@@ -269,30 +3002,102 @@ async def roles(ctx):
 
     await ctx.respond(embed=embed)
 
+def pull_targets(image_names, host):
+    """Expand `/docker images pull` input into (host, image) pairs.
+
+    Several images may be given separated by spaces or commas; `project:name` stands for
+    every image used by that Compose project's containers, pulled on their own hosts.
+    """
+    targets = {}
+    for image in image_names.replace(",", " ").split():
+        if image.startswith("project:"):
+            for entry in inventory.select(image):
+                if entry["image"]:
+                    targets[(entry["name"].split("/", 1)[0] if FLEET_MODE else host, entry["image"])] = None
+        else:
+            targets[(host, image)] = None
+    return [*targets]
+
+def render_pull_progress(jobs, joined, finished):
+    """Build the pull progress embed; `joined` holds jobs that were already running for someone else."""
+    lines = []
+    for job in jobs:
+        icon, detail = job.summary()
+        where = f"{job.host}/" if FLEET_MODE else ""
+        shared = " (already being pulled)" if job in joined else ""
+        lines.append(f"{icon} `{where}{job.image}` {detail}{shared}")
+    failed = any(job.state == "failed" for job in jobs)
+    embed = discord.Embed(
+        title="**__Docker Image Pull__**",
+        description="\n".join(lines)[:4000],
+        color=(discord.Colour.red() if failed else discord.Colour.green()) if finished else discord.Colour.blurple(),
+    )
+    embed.set_footer(text=get_current_time())
+    return embed
+
+async def pull_images(ctx, image_names, host):
+    """Queue the pulls and keep one progress message up to date until they all finish."""
+    try:
+        await inventory.wait_ready()
+    except DockerError as e:
+        await ctx.respond(f"Error executing Docker command: {e}")
+        return
+    targets = pull_targets(image_names, host)
+    if not targets:
+        await ctx.respond(f"No images found for `{image_names}`.")
+        return
+    joined = set()
+    jobs = []
+    for target_host, image in targets:
+        known = set(pulls.jobs.values())
+        job = pulls.submit(target_host, image)
+        if job in known:
+            joined.add(job)
+        jobs.append(job)
+
+    message = await ctx.respond(embed=render_pull_progress(jobs, joined, False))
+    work = asyncio.gather(*(asyncio.shield(job.task) for job in jobs))
+    shown = None
+    # Layer events arrive many times a second; edit at most once per interval, and only when the text changed
+    while not work.done():
+        await asyncio.wait([work], timeout=PULL_EDIT_INTERVAL)
+        embed = render_pull_progress(jobs, joined, False)
+        if not work.done() and embed.description != shown:
+            shown = embed.description
+            with contextlib.suppress(discord.HTTPException):
+                await message.edit(embed=embed)
+    await message.edit(embed=render_pull_progress(jobs, joined, True))
+
 @docker_management.command(description="Manage Docker images.")
 async def images(ctx, action: discord.Option(str, choices=['list', 'pull', 'remove']), 
-                image_name: discord.Option(str) = None):
-    if ctx.author.id not in config["allowed_user_ids"]:
+                image_name: discord.Option(str, description="Image; pull also takes several (space separated) or project:name") = None,
+                host: discord.Option(str, description="Docker host (defaults to the first configured host)", choices=[*DOCKER_HOSTS], required=False) = None):
+    if not authorization.is_allowed(ctx.author.id):
         await ctx.respond("You are not authorized to use this bot.")
         return
 
-    log_command(ctx.author.id, ctx.author.name, "images", {"action": action, "image_name": image_name})
+    log_command(ctx.author.id, ctx.author.name, "images", {"action": action, "image_name": image_name, "host": host})
 
     try:
         await ctx.defer()
         response = ""
+        client = docker_clients.get(host, docker)
 
         if action == "list":
-            result = subprocess.check_output(['docker', 'images', '--format', '{{.Repository}}:{{.Tag}}\t{{.Size}}'], text=True)
-            images_info = [line.split('\t') for line in result.split('\n') if line]
+            images_info = [
+                (tag, format_bytes(image["Size"]))
+                for image in await client.images(cache_ttl=QUERY_CACHE_TTL.get("images", 0))
+                for tag in (image.get("RepoTags") or ["<none>:<none>"])
+            ]
             response = "\n".join([f"**{image_name}** - Size: {image_size}" for image_name, image_size in images_info])
         
         elif action == "pull" and image_name:
-            subprocess.check_output(['docker', 'pull', image_name])
-            response = f"Image `{image_name}` has been pulled successfully."
-        
+            await pull_images(ctx, image_name, host or next(iter(DOCKER_HOSTS)))
+            return
+
         elif action == "remove" and image_name:
-            subprocess.check_output(['docker', 'rmi', image_name])
+            async with operations.slot(ctx.author.id):
+                await client.remove_image(image_name)
             response = f"Image `{image_name}` has been removed successfully."
         
         else:
@@ -307,59 +3112,757 @@ async def images(ctx, action: discord.Option(str, choices=['list', 'pull', 'remo
         embed.set_footer(text=get_current_time())
         await ctx.respond(embed=embed)
 
-    except subprocess.CalledProcessError as e:
+    except DockerError as e:
         await ctx.respond(f"Error executing Docker command: {e}")
 
 @docker_management.command(description="Prune Docker images.")
-async def prune(ctx, all: discord.Option(bool, description="Prune all Docker images (including unused ones)", required=True)):
-    if ctx.author.id not in config["allowed_user_ids"]:
+async def prune(ctx, all: discord.Option(bool, description="Prune all Docker images (including unused ones)", required=True),
+                host: discord.Option(str, description="Docker host (defaults to the first configured host)", choices=[*DOCKER_HOSTS], required=False) = None,
+                dry_run: discord.Option(bool, description="Only show what would be removed and how much space it frees", required=False) = False):
+    if not authorization.is_allowed(ctx.author.id):
         await ctx.respond("You are not authorized to use this bot.")
         return
 
-    log_command(ctx.author.id, ctx.author.name, "prune", {"all": all})
+    log_command(ctx.author.id, ctx.author.name, "prune", {"all": all, "host": host, "dry_run": dry_run})
 
     try:
         await ctx.defer()
-        prune_command = ['docker', 'image', 'prune', '-f']
-        if all:
-            prune_command.append('-a')
-        
-        subprocess.check_output(prune_command)
+        if dry_run:
+            model = disk_usage[host or next(iter(DOCKER_HOSTS))]
+            await model.current()
+            doomed, reclaimed, total, exact = model.prune_plan(all)
+            listed = "\n".join(f"• `{image_label(image)}` ({format_bytes(image['Size'])})" for image in doomed[:15])
+            if len(doomed) > 15:
+                listed += f"\n… and {len(doomed) - 15} more"
+            embed = discord.Embed(
+                title="**__Docker Image Pruning (dry run)__**",
+                description=f"Would remove `{len(doomed)}` image(s) and free {'' if exact else '~'}`{format_bytes(reclaimed)}`.\n"
+                            f"Their combined size is `{format_bytes(total)}`; layers still used by other images are kept."
+                            + (f"\n\n{listed}" if listed else "")
+                            + f"\n\nAs of <t:{int(model.updated_at)}:R>. Nothing was deleted.",
+                color=discord.Colour.blurple(),
+            )
+            embed.set_footer(text=get_current_time())
+            await ctx.respond(embed=embed)
+            return
+
+        async with operations.slot(ctx.author.id):
+            result = await docker_clients.get(host, docker).prune_images(all=all)
+        reclaimed = format_bytes((result or {}).get("SpaceReclaimed", 0))
         embed = discord.Embed(
             title="**__Docker Image Pruning__**",
-            description="Unused Docker images have been pruned successfully.",
+            description=f"Unused Docker images have been pruned successfully. Reclaimed `{reclaimed}`.",
             color=discord.Colour.blurple(),
         )
         embed.set_footer(text=get_current_time())
         await ctx.respond(embed=embed)
 
-    except subprocess.CalledProcessError as e:
+    except DockerError as e:
         await ctx.respond(f"Error executing Docker command: {e}")
 
-active_log_streams = {}  # Track active log streams
+active_log_streams = {}  # Track active log streams: user id -> container name
+log_followers = {}  # Shared upstream log readers: container name -> LogFollower
+log_read_until = {}  # (container name, reader) -> epoch time that reader's last stream was read up to
+
+
+class FollowView:
+    """Channels following a container through the same structured filter, batched together."""
+
+    def __init__(self, transform=None):
+        self.transform = transform  # line -> line to send, or None to drop it; None passes raw lines
+        self.channels = {}  # channel id -> channel
+        self.skipped = {}  # channel id -> lines skipped while the channel was behind
+        self.pending = []
+        self.pending_bytes = 0
+
+
+class LogFollower:
+    """One upstream `logs --follow` stream per container, fanned out to every subscribed channel.
+
+    Lines are batched until either the byte budget fills or the flush interval passes.
+    A channel whose outbound backlog is too deep is skipped and later told how many
+    lines it missed, so one slow channel never holds back the others. Subscribers with
+    the same `where`/`fields` share a view, so each line is parsed and filtered once
+    per distinct filter rather than once per channel.
+    """
+
+    def __init__(self, container_name, since=None, flush_interval=FOLLOW_FLUSH_INTERVAL, batch_bytes=MAX_MESSAGE_LENGTH,
+                 max_lag=OUTBOUND_LOG_BACKLOG // 2):
+        self.container_name = container_name
+        self.since = since  # Epoch time to read from; None starts at the current time
+        self.flush_interval = flush_interval
+        self.batch_bytes = batch_bytes
+        self.max_lag = max_lag
+        self.users = {}  # user id -> (channel id, view key)
+        self.views = {}  # view key (filter spec, None for raw lines) -> FollowView
+        self.consumers = {}  # In-process line callbacks that keep the stream open too -> reader ("analyzer", "archiver")
+        self.task = None
+
+    @property
+    def channels(self):
+        return {channel_id: channel for view in self.views.values() for channel_id, channel in view.channels.items()}
+
+    def subscribe(self, user_id, channel, key=None, transform=None):
+        view = self.views.get(key)
+        if view is None:
+            view = self.views[key] = FollowView(transform)
+        self.users[user_id] = (channel.id, key)
+        view.channels[channel.id] = channel
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    def unsubscribe(self, user_id):
+        subscription = self.users.pop(user_id, None)
+        if subscription and subscription not in self.users.values():
+            channel_id, key = subscription
+            view = self.views[key]
+            view.channels.pop(channel_id, None)
+            view.skipped.pop(channel_id, None)
+            if not view.channels:
+                del self.views[key]
+        self._close_if_unused()
+
+    def attach(self, consumer, reader):
+        self.consumers[consumer] = reader
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    def detach(self, consumer):
+        self.consumers.pop(consumer, None)
+        self._close_if_unused()
+
+    def _close_if_unused(self):
+        if not self.users and not self.consumers and self.task:
+            # Last subscriber left: cancelling closes the upstream stream
+            if log_followers.get(self.container_name) is self:
+                del log_followers[self.container_name]
+            self.task.cancel()
+
+    def flush(self, view=None):
+        for view in [view] if view else self.views.values():
+            if not view.pending:
+                continue
+            text, count = "\n".join(view.pending), len(view.pending)
+            view.pending = []
+            view.pending_bytes = 0
+            for channel_id, channel in view.channels.items():
+                if outbound.log_backlog(channel) > self.max_lag:
+                    view.skipped[channel_id] = view.skipped.get(channel_id, 0) + count
+                    continue
+                skipped = view.skipped.pop(channel_id, 0)
+                if skipped:
+                    outbound.send_log(channel, f"... skipped {skipped} lines (channel fell behind) ...")
+                outbound.send_log(channel, text)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    def _notify(self, message):
+        for channel in self.channels.values():
+            outbound.send(channel, message)
+
+    async def _run(self):
+        flusher = asyncio.create_task(self._flush_periodically())
+        read_until = self.since if self.since is not None else time.time()
+        try:
+            client, name = resolve_container(self.container_name)
+            async with contextlib.aclosing(client.logs(name, since=f"{read_until:.6f}", follow=True)) as log_lines:
+                async for line in log_lines:
+                    read_until = time.time()
+                    for consume in self.consumers:
+                        try:
+                            consume(line)
+                        except Exception as e:
+                            # One broken consumer must not end the stream for /follow users and the others
+                            print(f"❌ Log consumer {getattr(consume, '__qualname__', consume)} failed on {self.container_name}: {e}")
+                    for view in self.views.values():
+                        text = view.transform(line) if view.transform else line
+                        if text is None:
+                            continue
+                        view.pending.append(text)
+                        view.pending_bytes += len(text) + 1
+                        if view.pending_bytes >= self.batch_bytes:
+                            self.flush(view)
+            self.flush()
+            self._notify(f"📴 Log stream for `{self.container_name}` ended.")
+        except DockerError as e:
+            self._notify(f"⚠️ Error streaming logs for `{self.container_name}`: {e}")
+        finally:
+            flusher.cancel()
+            for reader in self.consumers.values():
+                log_read_until[self.container_name, reader] = max(read_until, log_read_until.get((self.container_name, reader), 0))
+            if log_followers.get(self.container_name) is self:
+                del log_followers[self.container_name]
+            for user_id in self.users:
+                active_log_streams.pop(user_id, None)
+
+
+def attach_log_consumer(name, consumer, reader):
+    """Feed a container's live log lines to `consumer` through its shared LogFollower.
+
+    Safe to call repeatedly: it only attaches when the consumer is not already on a
+    running stream, which also reopens streams that ended when the container restarted.
+    A reopened stream starts where `reader`'s last stream stopped reading (or at bot
+    startup for a container never read), so the restarted container's startup and crash
+    output is kept.
+    """
+    follower = log_followers.get(name)
+    if follower is None:
+        follower = log_followers[name] = LogFollower(name, since=log_read_until.get((name, reader), PROCESS_STARTED_AT))
+    if consumer not in follower.consumers:
+        follower.attach(consumer, reader)
+
+def detach_log_consumer(name, consumer):
+    follower = log_followers.get(name)
+    if follower:
+        follower.detach(consumer)
+
+
+class LogTargets:
+    """Which selected containers a background log reader should be attached to.
+
+    That is every running container, plus stopped ones whose FinishedAt changed since
+    the last poll: a container that restarted and crashed between polls was never seen
+    running, but its reopened stream still reads that short run's output. A container
+    stays a target until its stream has finished reading.
+    """
+
+    def __init__(self, selected):
+        self.selected = selected
+        self.finished = {}  # container name -> FinishedAt seen on the last poll
+
+    def update(self):
+        targets, finished = set(), {}
+        for entry in inventory.containers.values():
+            name = entry["name"]
+            if not self.selected(name):
+                continue
+            finished[name] = entry["finished_at"]
+            if name in self.finished:
+                ran = entry["finished_at"] != self.finished[name]
+            else:
+                ran = (entry["finished_at"] or 0) > PROCESS_STARTED_AT
+            if entry["status"] == "running" or ran or name in log_followers:
+                targets.add(name)
+        self.finished = finished
+        return targets
+
+
+class TemplateMiner:
+    """Drain-style online clustering of log lines into templates.
+
+    Lines are tokenized, tokens containing digits are masked, and the line is compared
+    only with templates of the same length and leading tokens. A close enough match is
+    merged into the template (differing tokens become `<*>`); otherwise a new template
+    starts. At most `max_templates` are kept, least recently seen evicted first.
+    """
+
+    MAX_TOKENS = 40
+    HAS_DIGIT = re.compile(r"\d")
+
+    def __init__(self, max_templates=1000, similarity=0.5, max_leaf=32):
+        self.max_templates = max_templates
+        self.similarity = similarity
+        self.max_leaf = max_leaf
+        self.templates = {}  # template id -> LogTemplate, least recently seen first
+        self.leaves = {}  # (length, first token, second token) -> [LogTemplate]
+        self.next_id = 0
+        self.lines = 0
+
+    def add(self, line):
+        """Cluster one line; returns (template, whether it is new)."""
+        has_digit = self.HAS_DIGIT.search
+        tokens = ["<*>" if has_digit(token) else token for token in line.split()[:self.MAX_TOKENS]]
+        key = (len(tokens), tokens[0] if tokens else "", tokens[1] if len(tokens) > 1 else "")
+        leaf = self.leaves.setdefault(key, [])
+
+        self.lines += 1
+        best, best_score = None, -1
+        for template in leaf:
+            score = sum(1 for mine, theirs in zip(template.tokens, tokens) if mine == theirs or mine == "<*>")
+            if score > best_score:
+                best, best_score = template, score
+        if best is not None and best_score >= self.similarity * len(tokens):
+            if best.tokens != tokens:
+                best.tokens = [mine if mine == theirs else "<*>" for mine, theirs in zip(best.tokens, tokens)]
+            best.count += 1
+            best.seen = self.lines
+            self.templates[best.id] = self.templates.pop(best.id)  # Most recently seen goes last
+            return best, False
+
+        if len(leaf) >= self.max_leaf:
+            self._evict(min(leaf, key=lambda template: template.seen))
+        if len(self.templates) >= self.max_templates:
+            self._evict(self.templates[next(iter(self.templates))])
+        template = LogTemplate(self.next_id, tokens, key)
+        template.seen = self.lines
+        self.next_id += 1
+        self.templates[template.id] = template
+        self.leaves.setdefault(key, []).append(template)
+        return template, True
+
+    def _evict(self, template):
+        del self.templates[template.id]
+        leaf = self.leaves[template.key]
+        leaf.remove(template)
+        if not leaf:
+            del self.leaves[template.key]
+
+
+class LogTemplate:
+    __slots__ = ("id", "tokens", "key", "count", "errors", "seen", "first_seen")
+
+    def __init__(self, template_id, tokens, key):
+        self.id = template_id
+        self.tokens = tokens
+        self.key = key
+        self.count = 1
+        self.errors = 0
+        self.seen = 0  # Line number it last matched, for eviction within a leaf
+        self.first_seen = time.time()
+
+    def __str__(self):
+        return " ".join(self.tokens)
+
+
+LOG_LEVEL_PATTERN = re.compile(r"\b(?:(fatal|panic|crit|critical|err|error)|(warn|warning))\b", re.IGNORECASE)
+
+
+class ContainerLogStats:
+    """Templates plus per-bucket line, error, warning and new-template counts for one container."""
+
+    def __init__(self, max_templates, history):
+        self.miner = TemplateMiner(max_templates)
+        self.current = [0, 0, 0, 0]  # lines, errors, warnings, new templates in the open bucket
+        self.new_templates = []  # A few of this bucket's new templates, for the alert
+        self.history = deque(maxlen=history)  # Closed buckets, oldest first
+        self.spiking = set()  # Alert kinds currently firing
+
+    def feed(self, line):
+        template, new = self.miner.add(line)
+        current = self.current
+        current[0] += 1
+        level = LOG_LEVEL_PATTERN.search(line, 0, 256)
+        if level:
+            if level.group(1):
+                current[1] += 1
+                template.errors += 1
+            else:
+                current[2] += 1
+        if new:
+            current[3] += 1
+            if len(self.new_templates) < 3:
+                self.new_templates.append(template)
+
+    def roll(self):
+        """Close the open bucket; returns it with the mean of the buckets before it."""
+        closed, samples = self.current, self.new_templates
+        baseline = [sum(bucket[index] for bucket in self.history) / len(self.history) for index in range(4)] if self.history else None
+        self.history.append(closed)
+        self.current, self.new_templates = [0, 0, 0, 0], []
+        return closed, samples, baseline
+
+
+class LogAnalyzer:
+    """Mines templates from the live logs of the containers selected in `log_analysis`.
+
+    Lines come from the shared LogFollower streams, so a container that is also being
+    followed is still read only once. Counting is O(1) per line; spike checks run once
+    per bucket. Each bucket's error and new-template counts are compared with the mean
+    of the previous buckets.
+    """
+
+    def __init__(self, options):
+        self.options = options or {}
+        self.selectors = self.options.get("containers", ["*"])
+        self.bucket_seconds = self.options.get("bucket_seconds", 60)
+        self.history = self.options.get("baseline_buckets", 30)
+        self.warmup = self.options.get("warmup_buckets", 5)
+        self.spike_factor = self.options.get("spike_factor", 3.0)
+        self.min_errors = self.options.get("min_errors", 10)
+        self.min_new_templates = self.options.get("min_new_templates", 5)
+        self.max_templates = self.options.get("max_templates", 1000)
+        self.stats = {}  # container name -> ContainerLogStats
+        self.targets = LogTargets(self.selected)
+        self.task = None
+
+    def selected(self, name):
+        return any(fnmatch.fnmatchcase(name, selector) for selector in self.selectors)
+
+    def _attach(self, name):
+        if name not in self.stats:
+            self.stats[name] = ContainerLogStats(self.max_templates, self.history)
+        attach_log_consumer(name, self.stats[name].feed, "analyzer")
+
+    def _detach(self, name):
+        detach_log_consumer(name, self.stats.pop(name).feed)
+
+    def check(self, name, stats):
+        closed, samples, baseline = stats.roll()
+        if baseline is None or len(stats.history) <= self.warmup:
+            return
+        _, errors, _, new = closed
+        for kind, value, mean, minimum in (("errors", errors, baseline[1], self.min_errors),
+                                           ("templates", new, baseline[3], self.min_new_templates)):
+            if value >= minimum and value > self.spike_factor * max(mean, 1):
+                if kind not in stats.spiking:
+                    stats.spiking.add(kind)
+                    self.alert(name, kind, value, mean, samples)
+            else:
+                stats.spiking.discard(kind)
+
+    def alert(self, name, kind, value, mean, samples):
+        channel = bot.get_channel(ALERT_CHANNEL_ID) if ALERT_CHANNEL_ID else None
+        if channel is None:
+            return
+        per = f"{self.bucket_seconds}s"
+        if kind == "errors":
+            title, description = "Error spike", f"`{value}` error lines in the last {per}, against `{mean:.1f}` on average."
+        else:
+            title, description = "New log patterns", f"`{value}` never-seen templates in the last {per}, against `{mean:.1f}` on average."
+            if samples:
+                description += "\n```" + "\n".join(str(template)[:200] for template in samples) + "```"
+        embed = discord.Embed(title=f"🚨 **{title}: `{name}`**", description=description, color=discord.Colour.red())
+        embed.set_footer(text=get_current_time())
+        outbound.send(channel, embed=embed, priority=PRIORITY_ALERT)
+
+    async def run(self):
+        # Wait for the first sync however long it takes; wait_ready() would raise and end this task
+        await inventory.ready.wait()
+        while not bot.is_closed():
+            # Follow every selected running container; streams that ended (restarts) are reopened where they stopped
+            targets = self.targets.update()
+            for name in targets:
+                self._attach(name)
+            for name in [*self.stats]:
+                if name not in targets:
+                    self._detach(name)
+            await asyncio.sleep(self.bucket_seconds)
+            for name, stats in [*self.stats.items()]:
+                self.check(name, stats)
+
+    def start(self):
+        if self.options and (self.task is None or self.task.done()):
+            self.task = bot.loop.create_task(self.run())
+
+
+log_analyzer = LogAnalyzer(LOG_ANALYSIS)
+
+
+def line_trigrams(text):
+    # The whole line: searches match anywhere in it, so a partial index would rule out real matches
+    text = text.lower()
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+def search_trigrams(search, regex=False):
+    """Trigrams every line matching a /logs search must contain (empty when the index cannot help)."""
+    if regex or not search:
+        return set()
+    grams = set()
+    for term in shlex.split(search):
+        if not term.startswith("-"):
+            grams |= line_trigrams(term)
+    return grams
+
+
+class ContainerArchive:
+    """Time-partitioned gzip segments of one container's logs, each with a trigram index.
+
+    Lines are stored as `<epoch> <line>`. The open segment is named `<start>-open.log.gz`
+    (epoch milliseconds); when it is closed it becomes `<start>-<end>.log.gz` next to `<start>-<end>.idx.gz`, the
+    sorted set of lowercase trigrams that occur in it. A search whose terms need a
+    trigram that a segment lacks skips that segment without decompressing it.
+
+    write() only buffers the line on the event loop; drain() compresses and indexes
+    the buffer in a worker thread. Callers hold `lock` around drain() and close() so
+    only one thread touches the files at a time.
+    """
+
+    MAX_BUFFERED = 100000  # Lines held between drains; more are dropped (and counted) if the disk falls behind
+
+    def __init__(self, directory, segment_seconds, segment_bytes):
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.file = None
+        self.started = None
+        self.start_ms = 0  # Segment name; strictly increasing, so segments cut within one millisecond never collide
+        self.written_at = None
+        self.bytes = 0
+        self.grams = set()
+        self.buffer = []  # (receive time, line) not yet written
+        self.dropped = 0
+        self.lock = asyncio.Lock()
+
+    @property
+    def open_path(self):
+        return os.path.join(self.directory, f"{self.start_ms}-open.log.gz")
+
+    def write(self, line):
+        if len(self.buffer) < self.MAX_BUFFERED:
+            self.buffer.append((time.time(), line))
+        else:
+            self.dropped += 1
+
+    async def drain(self):
+        batch, self.buffer = self.buffer, []
+        dropped, self.dropped = self.dropped, 0
+        if dropped:
+            print(f"⚠️ Log archive for {self.directory} fell behind and dropped {dropped} lines")
+        if batch:
+            await asyncio.to_thread(self._write_batch, batch)
+
+    def _write_batch(self, batch):
+        for now, line in batch:
+            if self.file is None or now - self.started >= self.segment_seconds or self.bytes >= self.segment_bytes:
+                self.close()
+                os.makedirs(self.directory, exist_ok=True)
+                self.started, self.bytes = now, 0
+                self.start_ms = max(int(now * 1000), self.start_ms + 1)
+                # Level 1: several times faster than the default 9, for a slightly larger archive
+                self.file = gzip.open(self.open_path, "ab", compresslevel=1)
+            data = f"{now:.3f} {line}\n".encode()
+            self.file.write(data)
+            self.bytes += len(data)
+            self.written_at = now
+            self.grams |= line_trigrams(line)
+        self.file.flush()  # Sync-flushes the deflate stream, so searches can read up to here
+
+    def close(self):
+        if self.file is None:
+            return
+        self.file.close()
+        name = f"{self.start_ms}-{max(int(self.written_at * 1000), self.start_ms) + 1}"
+        with gzip.open(os.path.join(self.directory, f"{name}.idx.gz"), "wt", encoding="utf-8") as index:
+            index.write("\n".join(sorted(self.grams)))
+        os.replace(self.open_path, os.path.join(self.directory, f"{name}.log.gz"))
+        self.file, self.grams = None, set()
+
+
+class LogArchiver:
+    """Tails the containers selected in `log_archive` into per-container ContainerArchives.
+
+    Like the log analyzer, it reads through the shared LogFollower streams. Archives
+    outlive the containers, so logs stay searchable after redeploys and log rotation.
+    """
+
+    def __init__(self, options):
+        self.options = options or {}
+        self.selectors = self.options.get("containers", ["*"])
+        self.directory = self.options.get("directory", "config/log_archive")
+        self.segment_seconds = self.options.get("segment_seconds", 3600)
+        self.segment_bytes = parse_memory(str(self.options.get("segment_size", "64m")))
+        self.retention_days = self.options.get("retention_days", 14)
+        self.archives = {}  # container name -> ContainerArchive being written
+        self.targets = LogTargets(lambda name: any(fnmatch.fnmatchcase(name, selector) for selector in self.selectors))
+        self.task = None
+
+    def path(self, name):
+        return os.path.join(self.directory, quote(name, safe=""))
+
+    def containers(self):
+        """Names of every container with archived logs, including removed ones."""
+        try:
+            return sorted(unquote(entry) for entry in os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+
+    async def search_segments(self, name, since, until):
+        """segments() for a search, after writing out whatever the container's archive still buffers."""
+        archive = self.archives.get(name)
+        if archive is None:
+            return await asyncio.to_thread(self.segments, name, since, until)
+        async with archive.lock:
+            await archive.drain()
+            return await asyncio.to_thread(self.segments, name, since, until)
+
+    def segments(self, name, since, until):
+        """(start, end, log path, trigrams or index path or None) of segments overlapping [since, until], in epoch seconds.
+
+        Runs in a worker thread, with the container's archive lock held if it is being written.
+        """
+        found = []
+        try:
+            files = os.listdir(self.path(name))
+        except FileNotFoundError:
+            return found
+        active = self.archives.get(name)
+        for file in files:
+            if not file.endswith(".log.gz"):
+                continue
+            start, _, end = file[:-len(".log.gz")].partition("-")
+            if end == "open":
+                if active is None or active.file is None or active.open_path != os.path.join(self.path(name), file):
+                    continue  # Left over from a crash; recover() renames it on startup
+                end, index = time.time() * 1000, set(active.grams)
+            else:
+                index = os.path.join(self.path(name), f"{start}-{end}.idx.gz")
+                index = index if os.path.exists(index) else None
+            if int(end) / 1000 >= since and int(start) / 1000 <= until:
+                found.append((int(start) / 1000, int(end) / 1000, os.path.join(self.path(name), file), index))
+        return sorted(found)
+
+    def recover(self):
+        """Close segments left open by a previous run; they stay searchable, just without an index."""
+        for name in self.containers():
+            for file in os.listdir(self.path(name)):
+                if file.endswith("-open.log.gz"):
+                    path = os.path.join(self.path(name), file)
+                    end = int(os.stat(path).st_mtime * 1000) + 1
+                    os.replace(path, os.path.join(self.path(name), file.replace("open", str(end))))
+
+    def expire(self):
+        cutoff = time.time() - self.retention_days * 86400
+        for name in self.containers():
+            for file in os.listdir(self.path(name)):
+                end = file.split(".", 1)[0].partition("-")[2]
+                if end.isdigit() and int(end) / 1000 < cutoff:
+                    os.unlink(os.path.join(self.path(name), file))
+
+    async def run(self):
+        # Wait for the first sync however long it takes; wait_ready() would raise and end this task
+        await inventory.ready.wait()
+        # All file work (compression, indexing, rotation, expiry) happens in worker threads
+        await asyncio.to_thread(self.recover)
+        ticks = 0
+        while not bot.is_closed():
+            targets = self.targets.update()
+            for name in targets:
+                if name not in self.archives:
+                    self.archives[name] = ContainerArchive(self.path(name), self.segment_seconds, self.segment_bytes)
+                attach_log_consumer(name, self.archives[name].write, "archiver")
+            for name in [*self.archives]:
+                archive = self.archives[name]
+                if name not in targets:
+                    del self.archives[name]
+                    detach_log_consumer(name, archive.write)
+                try:
+                    async with archive.lock:
+                        await archive.drain()
+                        if name not in targets:
+                            await asyncio.to_thread(archive.close)
+                except OSError as e:
+                    print(f"❌ Error writing log archive for {name}: {e}")
+            if ticks % 720 == 0:  # Hourly
+                try:
+                    await asyncio.to_thread(self.expire)
+                except OSError as e:
+                    print(f"❌ Error expiring log archive: {e}")
+            ticks += 1
+            await asyncio.sleep(5)
+
+    def start(self):
+        if self.options and (self.task is None or self.task.done()):
+            self.task = bot.loop.create_task(self.run())
+
+
+log_archiver = LogArchiver(LOG_ARCHIVE)
+
+
+def search_archive(segments, since, until, matches, grams, output):
+    """Write archived lines in [since, until] that match to `output`; runs in a worker thread.
+
+    Returns (lines written, preview, segments read, segments skipped by their index, truncated).
+    """
+    count, preview, read, skipped = 0, deque(maxlen=LOGS_PREVIEW_LINES), 0, 0
+    for _, _, path, index in segments:
+        if grams and index is not None:
+            if not isinstance(index, set):
+                try:
+                    with gzip.open(index, "rt", encoding="utf-8") as file:
+                        index = set(file.read().split("\n"))
+                except (EOFError, OSError):
+                    index = None  # Expired or damaged meanwhile; fall back to reading the segment
+            if index is not None and not grams <= index:
+                skipped += 1
+                continue
+        read += 1
+        try:
+            with gzip.open(path, "rb") as file:
+                for raw in file:
+                    stamp, _, line = raw.decode(errors="replace").rstrip("\n").partition(" ")
+                    when = float(stamp)
+                    if when < since or when > until or (matches and not matches(line)):
+                        continue
+                    line = f"{datetime.fromtimestamp(when, timezone.utc).isoformat(timespec='milliseconds')} {line}"
+                    output.write(line.encode() + b"\n")
+                    preview.append(line)
+                    count += 1
+                    if count >= LOGS_MAX_LINES or output.fileobj.tell() >= LOGS_MAX_ATTACHMENT:
+                        return count, preview, read, skipped, True
+        except (EOFError, ValueError, OSError):
+            pass  # The open segment ends mid-stream, a crash left a partial last line, or the segment was rotated or expired meanwhile
+    return count, preview, read, skipped, False
+
 
-# Modify the follow command
 @bot.slash_command(description="Follow live logs of a Docker container.")
-async def follow(ctx, container_name: discord.Option(str, autocomplete=get_container_names)):
-    if ctx.author.id not in config["allowed_user_ids"]:
+async def follow(ctx, container_name: discord.Option(str, autocomplete=get_container_names),
+                 where: discord.Option(str, description="Field filter for JSON/logfmt lines (e.g., level>=warn route=/api/*)", required=False) = None,
+                 fields: discord.Option(str, description="Only show these fields (e.g., level,msg,latency_ms)", required=False) = None):
+    if not authorization.is_allowed(ctx.author.id):
         await ctx.respond("You are not authorized to use this bot.")
         return
 
-    log_command(ctx.author.id, ctx.author.name, "follow", {"container_name": container_name})
+    log_command(ctx.author.id, ctx.author.name, "follow", {"container_name": container_name, "where": where, "fields": fields})
 
     # Check if the user already has an active log stream
     if ctx.author.id in active_log_streams:
         await ctx.respond("You already have an active log stream. Use `/stop` to stop it before starting a new one.")
         return
 
-    # Start streaming logs from the current time
-    await ctx.respond(f"📡 **Streaming logs for `{container_name}`...** (Type `/stop` to stop logging)")
-    await follow_stream_logs(ctx, container_name)
+    try:
+        transform = compile_structured_view(where, fields)
+    except ValueError as e:
+        await ctx.respond(f"Invalid filter `{where}`: {e}")
+        return
+    key = (where or "", fields or "") if transform else None
+
+    # Join the container's shared stream, starting one if nobody follows it yet
+    follower = log_followers.get(container_name)
+    shared = follower is not None
+    if not shared:
+        follower = log_followers[container_name] = LogFollower(container_name)
+    active_log_streams[ctx.author.id] = container_name
+    follower.subscribe(ctx.author.id, ctx.channel, key, transform)
+
+    await ctx.respond(f"📡 **Streaming logs for `{container_name}`...**" + (" (joined existing stream)" if shared else "")
+                      + (f" · where `{where}`" if where else "") + (f" · fields `{fields}`" if fields else "") + " (Type `/stop` to stop logging)")
+
+@bot.slash_command(description="Show the most frequent log templates of an analyzed container.")
+async def patterns(ctx, container_name: discord.Option(str, autocomplete=get_container_names)):
+    if not authorization.is_allowed(ctx.author.id):
+        await ctx.respond("You are not authorized to use this bot.")
+        return
+
+    log_command(ctx.author.id, ctx.author.name, "patterns", {"container_name": container_name})
+
+    stats = log_analyzer.stats.get(container_name)
+    if stats is None:
+        await ctx.respond(f"`{container_name}` is not being analyzed. Add it to `log_analysis.containers` in the config.")
+        return
+
+    top = sorted(stats.miner.templates.values(), key=lambda template: -template.count)[:10]
+    lines, errors = stats.current[0], stats.current[1]
+    lines += sum(bucket[0] for bucket in stats.history)
+    errors += sum(bucket[1] for bucket in stats.history)
+    embed = discord.Embed(
+        title=f"🧩 Log Patterns: `{container_name}`",
+        description=f"`{len(stats.miner.templates)}` templates · `{lines}` lines · `{errors}` errors in the last "
+                    f"{human_duration(log_analyzer.bucket_seconds * (len(stats.history) + 1)).lower()}.\n"
+                    "Template counts are since analysis started.",
+        color=discord.Colour.blue()
+    )
+    for template in top:
+        embed.add_field(name=f"{template.count} lines" + (f" · {template.errors} errors" if template.errors else ""),
+                        value=f"```{str(template)[:1000]}```", inline=False)
+    embed.set_footer(text=get_current_time())
+    await ctx.respond(embed=embed)
 
-# Add a stop command
 @bot.slash_command(description="Stop an active log stream.")
 async def stop(ctx):
-    if ctx.author.id not in config["allowed_user_ids"]:
+    if not authorization.is_allowed(ctx.author.id):
         await ctx.respond("You are not authorized to use this bot.")
         return
 
@@ -367,72 +3870,14 @@ async def stop(ctx):
         await ctx.respond("You do not have an active log stream to stop.")
         return
 
-    # Stop the log stream
-    process = active_log_streams[ctx.author.id]["process"]
-    process.terminate()
-    del active_log_streams[ctx.author.id]
+    # Leave the shared stream; the upstream closes when the last subscriber leaves
+    container_name = active_log_streams.pop(ctx.author.id)
+    follower = log_followers.get(container_name)
+    if follower:
+        follower.unsubscribe(ctx.author.id)
 
     await ctx.respond("✅ Log streaming stopped.")
 
-async def follow_stream_logs(ctx, container_name):
-    try:
-        process = await asyncio.create_subprocess_exec(
-            "docker", "logs", "-f", "--since", "0s", container_name,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-
-        active_log_streams[ctx.author.id] = {"process": process, "container_name": container_name}
-
-        buffer = []
-        current_length = 0
-        MAX_MESSAGE_LENGTH = 1900  # Leave some room for the code block formatting
-
-        while True:
-            line = await process.stdout.readline()
-            if not line:
-                break
-
-            decoded_line = line.decode().strip()
-            line_length = len(decoded_line) + 1  # +1 for the newline
-
-            # If adding this line would exceed the limit, send what we have and start a new buffer
-            if current_length + line_length > MAX_MESSAGE_LENGTH:
-                if buffer:
-                    await ctx.send(f"```{chr(10).join(buffer)}```")
-                    buffer = []
-                    current_length = 0
-                
-                # If a single line is longer than the maximum length, split it
-                if line_length > MAX_MESSAGE_LENGTH:
-                    # Split the long line into chunks
-                    chunks = [decoded_line[i:i+MAX_MESSAGE_LENGTH] for i in range(0, len(decoded_line), MAX_MESSAGE_LENGTH)]
-                    for chunk in chunks:
-                        await ctx.send(f"```{chunk}```")
-                else:
-                    buffer.append(decoded_line)
-                    current_length = line_length
-            else:
-                buffer.append(decoded_line)
-                current_length += line_length
-
-            # If we have accumulated a decent number of lines, send them
-            if len(buffer) >= 10:
-                await ctx.send(f"```{chr(10).join(buffer)}```")
-                buffer = []
-                current_length = 0
-
-        # Send any remaining logs
-        if buffer:
-            await ctx.send(f"```{chr(10).join(buffer)}```")
-
-    except Exception as e:
-        await ctx.respond(f"⚠️ Error streaming logs: {e}")
-
-    finally:
-        if ctx.author.id in active_log_streams:
-            del active_log_streams[ctx.author.id]
-
 @bot.slash_command(description="List all Docker containers.")
 async def list(ctx):
     role = await check_permissions(ctx, "dev")
@@ -440,32 +3885,64 @@ async def list(ctx):
         return
 
     try:
-        result = subprocess.check_output(['docker', 'ps', '--all', '--format', '{{.Names}}\t{{.Status}}'], text=True)
-        containers = [line.split('\t') for line in result.strip().split("\n") if line]
+        await inventory.wait_ready()
+        containers = [(name, describe_status(inventory.get(name))) for name in inventory.sorted_names]
 
         embed = discord.Embed(title="📦 Docker Containers", color=discord.Colour.blue())
         for name, status in containers:
             embed.add_field(name=name, value=f"Status: `{status}`", inline=False)
+        for host in inventory.unavailable():
+            embed.add_field(name=f"⚠️ {host}", value="Host unreachable, its containers are not listed.", inline=False)
 
         await ctx.respond(embed=embed)
 
-    except subprocess.CalledProcessError as e:
+    except DockerError as e:
         await ctx.respond(f"❌ Error: {e}")
 
 
+@bot.slash_command(description="Pin a live, self-updating container dashboard in this channel.")
+async def dashboard(ctx, action: discord.Option(str, choices=["start", "stop"], required=False) = "start"):
+    role = await check_permissions(ctx, "dev")
+    if not role:
+        return
+
+    log_command(ctx.author.id, ctx.author.name, "dashboard", {"action": action})
+
+    if action == "stop":
+        if await dashboards.remove(ctx.channel):
+            await ctx.respond("✅ Dashboard stopped.")
+        else:
+            await ctx.respond("⚠️ There is no dashboard in this channel.", ephemeral=True)
+        return
+
+    await ctx.defer(ephemeral=True)
+    try:
+        await inventory.wait_ready()
+        await dashboards.create(ctx.channel)
+    except (discord.HTTPException, DockerError) as e:
+        await ctx.respond(f"❌ Error creating dashboard: {e}", ephemeral=True)
+        return
+    await ctx.respond(f"✅ Dashboard pinned. It refreshes at most every {DASHBOARD_INTERVAL}s when something changes.", ephemeral=True)
+
+
 @docker_management.command(description="Retrieve logs of a Docker container with optional filtering.")
 async def logs(
     ctx, 
     container_name: discord.Option(str, description="Select a Docker container", autocomplete=get_container_names),
     timeframe: discord.Option(str, description="Specify timeframe (e.g., 10m for minutes, 2h for hours)"),
-    search: discord.Option(str, description="Optional: Filter logs by keyword", required=False) = None
+    search: discord.Option(str, description="Optional: Filter by keywords (all must match, -word excludes)", required=False) = None,
+    regex: discord.Option(bool, description="Treat the search as a regular expression", required=False) = False,
+    tail: discord.Option(int, description="Only scan the last N lines of the timeframe", required=False) = None,
+    where: discord.Option(str, description="Field filter for JSON/logfmt lines (e.g., level>=warn latency_ms>500)", required=False) = None,
+    fields: discord.Option(str, description="Only show these fields (e.g., level,msg,route)", required=False) = None
 ):
-    if ctx.author.id not in config["allowed_user_ids"]:
+    if not authorization.is_allowed(ctx.author.id):
         await ctx.respond("You are not authorized to use this bot.")
         return
 
-    log_command(ctx.author.id, ctx.author.name, "logs", {"container_name": container_name, "timeframe": timeframe, "search": search})
+    log_command(ctx.author.id, ctx.author.name, "logs", {"container_name": container_name, "timeframe": timeframe, "search": search, "regex": regex, "tail": tail, "where": where, "fields": fields})
 
+    spool = None
     try:
         await ctx.defer()
 
@@ -479,52 +3956,69 @@ async def logs(
             await ctx.respond("Timeframe should be a number followed by 'm' or 'h' (e.g., '10m', '2h').")
             return
 
-        # Fetch logs
-        logs = subprocess.check_output(
-            ['docker', 'logs', '--since', timeframe, container_name],
-            text=True,
-            stderr=subprocess.STDOUT
-        )
+        try:
+            matches = compile_log_filter(search, regex)
+        except (re.error, ValueError) as e:
+            await ctx.respond(f"Invalid search `{search}`: {e}")
+            return
+        try:
+            transform = compile_structured_view(where, fields)
+        except ValueError as e:
+            await ctx.respond(f"Invalid filter `{where}`: {e}")
+            return
 
-        # Apply search filter if provided
-        if search and search.strip():
-            filtered_logs = []
-            for line in logs.splitlines():
-                if search.lower() in line.lower():
-                    filtered_logs.append(line)
-            
-            if not filtered_logs:
+        # Stream the logs straight into a gzip file; only the preview is kept in memory
+        spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        preview = deque(maxlen=LOGS_PREVIEW_LINES)
+        log_line_count = 0
+        truncated = False
+        client, name = resolve_container(container_name)
+        with gzip.GzipFile(fileobj=spool, mode="wb") as archive:
+            log_lines = client.logs(name, since=parse_since(timeframe), tail=tail)
+            async with contextlib.aclosing(log_lines) as lines:
+                async for line in lines:
+                    if matches and not matches(line):
+                        continue
+                    if transform:
+                        line = transform(line)
+                        if line is None:
+                            continue
+                    archive.write(line.encode() + b"\n")
+                    preview.append(line)
+                    log_line_count += 1
+                    if log_line_count >= LOGS_MAX_LINES or spool.tell() >= LOGS_MAX_ATTACHMENT:
+                        truncated = True
+                        break
+
+        if not log_line_count:
+            if where and where.strip():
+                await ctx.respond(f"No structured logs matching `{where}` found for `{container_name}` in the last {timeframe}.")
+            elif search and search.strip():
                 await ctx.respond(f"No logs containing `{search}` found for `{container_name}` in the last {timeframe}.")
-                return
-                
-            logs = "\n".join(filtered_logs)
-
-        if not logs.strip():
-            await ctx.respond(f"No logs available for `{container_name}` in the last {timeframe}.")
+            else:
+                await ctx.respond(f"No logs available for `{container_name}` in the last {timeframe}.")
             return
 
         # Create embed for initial response
         embed = discord.Embed(
             title=f"📜 Docker Logs: `{container_name}`",
-            description=f"**Timeframe:** Last {timeframe}" + (f"\n**Filter:** `{search}`" if search else ""),
+            description=f"**Timeframe:** Last {timeframe}" + (f"\n**Filter:** `{search}`" if search else "")
+                        + (f"\n**Where:** `{where}`" if where else "") + (f"\n**Fields:** `{fields}`" if fields else ""),
             color=discord.Colour.blue()
         )
         
         # Add log summary information
-        log_line_count = logs.count('\n') + 1 if logs.strip() else 0
         embed.add_field(name="Summary", value=f"Found {log_line_count} log entries" + 
-                                              (f" containing `{search}`" if search else ""))
+                                              (f" containing `{search}`" if search else "") +
+                                              (" (truncated at the line or size limit)" if truncated else ""), inline=False)
+        preview_text = "\n".join(preview)[-1000:]
+        embed.add_field(name=f"Last {len(preview)} lines", value=f"```{preview_text}```", inline=False)
         
         embed.set_footer(text=get_current_time())
-        await ctx.respond(embed=embed)
-
-        # Split and send logs in chunks to handle Discord's message length limit
-        log_chunks = [logs[i:i+1900] for i in range(0, len(logs), 1900)]
-        for chunk in log_chunks:
-            if chunk.strip():  # Only send non-empty chunks
-                await ctx.send(f"```{chunk}```")
+        spool.seek(0)
+        await ctx.respond(embed=embed, file=discord.File(spool, filename=f"{container_name}-{timeframe}.log.gz"))
 
-    except subprocess.CalledProcessError as e:
+    except DockerError as e:
         error_embed = discord.Embed(
             title="⚠️ Error Fetching Logs",
             description=f"Failed to retrieve logs for `{container_name}`: {str(e)}",
@@ -533,6 +4027,75 @@ async def logs(
         error_embed.set_footer(text=get_current_time())
         await ctx.respond(embed=error_embed)
 
+    finally:
+        if spool:
+            spool.close()
+
+
+archive_group = bot.create_group("logs", "Search archived container logs")
+
+async def get_archived_names(ctx: discord.AutocompleteContext):
+    query = (ctx.value or "").lower()
+    return [name for name in log_archiver.containers() if query in name.lower()][:25] or ["No archived logs"]
+
+@archive_group.command(name="search", description="Search archived logs, including containers that were removed or redeployed.")
+async def search_logs(
+    ctx,
+    container_name: discord.Option(str, description="Archived container", autocomplete=get_archived_names),
+    search: discord.Option(str, description="Keywords (all must match, -word excludes, quote phrases)"),
+    since: discord.Option(str, description="How far back to search (e.g., 30m, 6h, 7d)", required=False) = "1d",
+    until: discord.Option(str, description="Stop this long ago (e.g., 1h); defaults to now", required=False) = None,
+    regex: discord.Option(bool, description="Treat the search as a regular expression", required=False) = False
+):
+    if not authorization.is_allowed(ctx.author.id):
+        await ctx.respond("You are not authorized to use this bot.")
+        return
+
+    log_command(ctx.author.id, ctx.author.name, "logs search", {"container_name": container_name, "search": search, "since": since, "until": until, "regex": regex})
+
+    units = {"m": 60, "h": 3600, "d": 86400}
+    for window in (since, until or "0m"):
+        if window[-1:] not in units or not window[:-1].isdigit():
+            await ctx.respond("Invalid window format. Use 'm', 'h' or 'd' (e.g., '30m', '6h', '7d').")
+            return
+    try:
+        matches = compile_log_filter(search, regex)
+    except (re.error, ValueError) as e:
+        await ctx.respond(f"Invalid search `{search}`: {e}")
+        return
+
+    await ctx.defer()
+    now = time.time()
+    start = now - int(since[:-1]) * units[since[-1]]
+    end = now - int(until[:-1]) * units[until[-1]] if until else now
+    segments = await log_archiver.search_segments(container_name, start, end)
+    if not segments:
+        await ctx.respond(f"No archived logs for `{container_name}` in that time range.")
+        return
+
+    # Decompression and matching run in a thread; the index lets most segments be skipped unread
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+        with gzip.GzipFile(fileobj=spool, mode="wb") as output:
+            count, preview, read, skipped, truncated = await asyncio.to_thread(
+                search_archive, segments, start, end, matches, search_trigrams(search, regex), output)
+        scanned = f"Read {read} of {len(segments)} segments ({skipped} ruled out by the index)."
+        if not count:
+            await ctx.respond(f"No archived logs containing `{search}` found for `{container_name}`. {scanned}")
+            return
+
+        window = f"<t:{int(start)}:f> – <t:{int(end)}:f>"
+        embed = discord.Embed(
+            title=f"🗄️ Archived Logs: `{container_name}`",
+            description=f"**Window:** {window}\n**Filter:** `{search}`",
+            color=discord.Colour.blue()
+        )
+        embed.add_field(name="Summary", value=f"Found {count} log entries" + (" (truncated at the line or size limit)" if truncated else "") + f"\n{scanned}", inline=False)
+        preview_text = "\n".join(preview)[-1000:]
+        embed.add_field(name=f"Last {len(preview)} lines", value=f"```{preview_text}```", inline=False)
+        embed.set_footer(text=get_current_time())
+        spool.seek(0)
+        await ctx.respond(embed=embed, file=discord.File(spool, filename=f"{quote(container_name, safe='')}-search.log.gz"))
+
 
 @docker_management.command(description="Set resource limits for a Docker container.")
 async def limit(
@@ -541,7 +4104,7 @@ async def limit(
     cpu: discord.Option(str, description="CPU limit (e.g., 0.5 for 50% of a core, 2 for 2 cores)", required=False) = None,
     memory: discord.Option(str, description="Memory limit (e.g., 512m, 1g)", required=False) = None
 ):
-    if ctx.author.id not in config["allowed_user_ids"]:
+    if not authorization.is_allowed(ctx.author.id):
         await ctx.respond("You are not authorized to use this bot.")
         return
 
@@ -556,20 +4119,21 @@ async def limit(
         await ctx.defer()
 
         # First check if container exists and is running
-        container_status = subprocess.check_output(['docker', 'inspect', '-f', '{{.State.Status}}', container_name], text=True).strip()
+        client, name = resolve_container(container_name)
+        container_status = (await client.inspect(name))["State"]["Status"]
         if container_status != 'running':
             await ctx.respond(f"Container `{container_name}` is not running. Resource limits can only be updated for running containers.")
             return
 
-        # Prepare update command
-        update_cmd = ['docker', 'update']
+        # Prepare update request
+        nano_cpus = None
+        memory_bytes = None
         
         # Add CPU limit if provided
         if cpu is not None:
             try:
                 # Validate CPU format
-                float(cpu)  # This will raise ValueError if cpu isn't a valid number
-                update_cmd.extend(['--cpus', cpu])
+                nano_cpus = int(float(cpu) * 1e9)  # This will raise ValueError if cpu isn't a valid number
             except ValueError:
                 await ctx.respond(f"Invalid CPU limit format: `{cpu}`. Please use a number (e.g., 0.5, 2).")
                 return
@@ -577,16 +4141,15 @@ async def limit(
         # Add memory limit if provided
         if memory is not None:
             # Validate memory format (simple check)
-            if not memory[-1].lower() in ['b', 'k', 'm', 'g'] and not memory.isdigit():
+            try:
+                memory_bytes = parse_memory(memory)
+            except (ValueError, KeyError, IndexError):
                 await ctx.respond(f"Invalid memory limit format: `{memory}`. Please use a format like 512m or 1g.")
                 return
-            update_cmd.extend(['--memory', memory])
 
-        # Add container name to command
-        update_cmd.append(container_name)
-        
-        # Execute update command
-        result = subprocess.check_output(update_cmd, stderr=subprocess.STDOUT, text=True)
+        # Execute update request
+        async with operations.slot(ctx.author.id):
+            await client.update(name, nano_cpus=nano_cpus, memory=memory_bytes)
         
         # Create response embed
         embed = discord.Embed(
@@ -602,22 +4165,18 @@ async def limit(
             embed.add_field(name="Memory Limit", value=f"`{memory}`", inline=True)
             
         # Get current resource usage for comparison
-        stats = subprocess.check_output(
-            ['docker', 'stats', '--no-stream', '--format', '{{.CPUPerc}} {{.MemUsage}}', container_name],
-            text=True
-        ).strip().split()
-        
-        if len(stats) >= 2:
-            cpu_usage, mem_usage = stats[0], stats[1]
-            embed.add_field(name="Current Usage", value=f"CPU: `{cpu_usage}` | Memory: `{mem_usage}`", inline=False)
+        stats = calculate_stats(await client.stats(name))
+        cpu_usage = f"{stats['cpu_percent']:.2f}%"
+        mem_usage = f"{format_binary_bytes(stats['mem_usage'])} / {format_binary_bytes(stats['mem_limit'])}"
+        embed.add_field(name="Current Usage", value=f"CPU: `{cpu_usage}` | Memory: `{mem_usage}`", inline=False)
         
         embed.set_footer(text=get_current_time())
         await ctx.respond(embed=embed)
 
-    except subprocess.CalledProcessError as e:
+    except DockerError as e:
         error_embed = discord.Embed(
             title="⚠️ Error Setting Resource Limits",
-            description=f"Failed to update limits for `{container_name}`: {str(e.output if hasattr(e, 'output') else e)}",
+            description=f"Failed to update limits for `{container_name}`: {str(e)}",
             color=discord.Colour.red()
         )
         error_embed.set_footer(text=get_current_time())
@@ -626,7 +4185,7 @@ async def limit(
 
 @bot.slash_command(description="Get system-wide Docker information.")
 async def system(ctx):
-    if ctx.author.id not in config["allowed_user_ids"]:
+    if not authorization.is_allowed(ctx.author.id):
         await ctx.respond("You are not authorized to use this bot.")
         return
 
@@ -634,24 +4193,38 @@ async def system(ctx):
 
     try:
         await ctx.defer()
-        system_info = subprocess.check_output(["docker", "system", "df"], text=True)
-        container_count = subprocess.check_output(["docker", "ps", "-q"], text=True).count("\n")
+        await inventory.wait_ready()
+        # Answer from the cached disk usage; only wait (briefly) for hosts that have never been measured
+        pending = [model.refresh() for model in disk_usage.values() if model.snapshot() is None]
+        if pending:
+            await asyncio.wait(pending, timeout=HOST_TIMEOUT)
+        container_count = len(inventory.running())
 
         embed = discord.Embed(
             title="📊 **Docker System Info**",
             description=f"🖥️ **Total Running Containers:** `{container_count}`",
             color=discord.Colour.blue()
         )
-        embed.add_field(name="📦 **Resource Usage:**", value=f"```{system_info.strip()}```", inline=False)
+        for host, model in disk_usage.items():
+            title = f"📦 **Resource Usage ({host}):**" if FLEET_MODE else "📦 **Resource Usage:**"
+            if model.df is None:
+                embed.add_field(name=title, value=f"⚠️ {model.error}" if model.error else "⏳ Still calculating, try again shortly.", inline=False)
+                continue
+            value = f"```{format_system_df(model.df).strip()}```As of <t:{int(model.updated_at)}:R>"
+            if model.error:
+                value += f" · ⚠️ last refresh failed: {model.error}"
+            elif model.task is not None and not model.task.done():
+                value += " · refreshing"
+            embed.add_field(name=title, value=value, inline=False)
         embed.set_footer(text=get_current_time())
         await ctx.respond(embed=embed)
 
-    except subprocess.CalledProcessError as e:
+    except DockerError as e:
         await ctx.respond(f"⚠️ Error fetching system info: {e}")
 
 @bot.slash_command(description="Check the health of a Docker container.")
 async def health(ctx, container_name: discord.Option(str, autocomplete=get_container_names)):
-    if ctx.author.id not in config["allowed_user_ids"]:
+    if not authorization.is_allowed(ctx.author.id):
         await ctx.respond("You are not authorized to use this bot.")
         return
 
@@ -659,10 +4232,11 @@ async def health(ctx, container_name: discord.Option(str, autocomplete=get_conta
 
     try:
         await ctx.defer()
-        health_status = subprocess.check_output(
-            ["docker", "inspect", "--format={{.State.Health.Status}}", container_name],
-            text=True
-        ).strip()
+        await inventory.wait_ready()
+        entry = inventory.get(container_name)
+        if not entry or not entry["health"]:
+            raise DockerError(f"{container_name} has no health check")
+        health_status = entry["health"]
 
         color = discord.Colour.green() if health_status == "healthy" else \
                 discord.Colour.red() if health_status == "unhealthy" else \
@@ -676,9 +4250,106 @@ async def health(ctx, container_name: discord.Option(str, autocomplete=get_conta
         embed.set_footer(text=get_current_time())
         await ctx.respond(embed=embed)
 
-    except subprocess.CalledProcessError:
+    except DockerError:
         await ctx.respond(f"⚠️ `{container_name}` does not support health checks or does not exist.")
 
+@bot.slash_command(description="Show recorded CPU, memory and IO history of a Docker container.")
+async def stats(
+    ctx,
+    container_name: discord.Option(str, description="Select a Docker container", autocomplete=get_container_names),
+    window: discord.Option(str, description="Window to show (e.g., 5m, 6h, 7d)", required=False) = "1h"
+):
+    if not authorization.is_allowed(ctx.author.id):
+        await ctx.respond("You are not authorized to use this bot.")
+        return
+
+    log_command(ctx.author.id, ctx.author.name, "stats", {"container_name": container_name, "window": window})
+
+    units = {"m": 60, "h": 3600, "d": 86400}
+    if window[-1:] not in units or not window[:-1].isdigit():
+        await ctx.respond("Invalid window format. Use 'm', 'h' or 'd' (e.g., '5m', '6h', '7d').")
+        return
+    seconds = int(window[:-1]) * units[window[-1]]
+
+    cpu = metrics_store.window(container_name, seconds, "cpu")
+    if cpu is None or not cpu[1][0]:
+        await ctx.respond(f"No stats recorded for `{container_name}` in the last {window}.")
+        return
+    resolution, (times, _, cpu_max, cpu_avg) = cpu
+
+    def summary(metric, formatter):
+        _, (_, _, maxs, avgs) = metrics_store.window(container_name, seconds, metric)
+        return (f"p50 `{formatter(percentile(avgs, 0.5))}` · p95 `{formatter(percentile(avgs, 0.95))}` · "
+                f"p99 `{formatter(percentile(avgs, 0.99))}` · max `{formatter(max(maxs))}`"), avgs
+
+    cpu_summary, _ = summary("cpu", lambda value: f"{value:.1f}%")
+    mem_summary, mem_avg = summary("mem", format_binary_bytes)
+    rate = lambda value: f"{format_bytes(value)}/s"
+
+    embed = discord.Embed(
+        title=f"📈 Stats: `{container_name}`",
+        description=f"**Window:** Last {window} · **Resolution:** {human_duration(resolution).lower()} · **Points:** {len(times)}",
+        color=discord.Colour.blue()
+    )
+    embed.add_field(name="🔥 CPU", value=f"{cpu_summary}\n```{sparkline(cpu_avg)}```", inline=False)
+    embed.add_field(name="🧠 Memory", value=f"{mem_summary}\n```{sparkline(mem_avg)}```", inline=False)
+    embed.add_field(name="🌐 Network RX", value=summary("net_rx", rate)[0], inline=False)
+    embed.add_field(name="🌐 Network TX", value=summary("net_tx", rate)[0], inline=False)
+    embed.add_field(name="💾 Block Read", value=summary("blk_read", rate)[0], inline=False)
+    embed.add_field(name="💾 Block Write", value=summary("blk_write", rate)[0], inline=False)
+    embed.set_footer(text=get_current_time())
+    await ctx.respond(embed=embed)
+
+EVENT_ICONS = {"die": "💀", "oom": "💥", "restart": "🔄", "health_status": "🩺"}
+
+@bot.slash_command(description="Show recent die, OOM, restart and health events of a Docker container.")
+async def events(
+    ctx,
+    container_name: discord.Option(str, description="Select a Docker container", autocomplete=get_container_names),
+    window: discord.Option(str, description="Window to show (e.g., 30m, 6h, 1d)", required=False) = "1h"
+):
+    if not authorization.is_allowed(ctx.author.id):
+        await ctx.respond("You are not authorized to use this bot.")
+        return
+
+    log_command(ctx.author.id, ctx.author.name, "events", {"container_name": container_name, "window": window})
+
+    units = {"m": 60, "h": 3600, "d": 86400}
+    if window[-1:] not in units or not window[:-1].isdigit():
+        await ctx.respond("Invalid window format. Use 'm', 'h' or 'd' (e.g., '30m', '6h', '1d').")
+        return
+
+    recorded = event_timeline.window(container_name, int(window[:-1]) * units[window[-1]])
+    if not recorded:
+        await ctx.respond(f"No die, OOM, restart or health events recorded for `{container_name}` in the last {window}.")
+        return
+
+    counts = {}
+    for _, action, _ in recorded:
+        counts[action] = counts.get(action, 0) + 1
+    lines = []
+    length = 0
+    for when, action, detail in reversed(recorded):  # Newest first, so truncation drops the oldest
+        line = f"<t:{int(when)}:T> {EVENT_ICONS[action]} `{action.replace('_status', '')}` {detail}".rstrip()
+        if length + len(line) > 3800:
+            lines.append(f"… and {len(recorded) - len(lines)} older")
+            break
+        lines.append(line)
+        length += len(line) + 1
+
+    embed = discord.Embed(
+        title=f"🗓️ Events: `{container_name}`",
+        description="\n".join(lines),
+        color=discord.Colour.red() if counts.get("oom") or counts.get("die", 0) > 1 else discord.Colour.blue()
+    )
+    embed.add_field(name="Last " + window, value=" · ".join(f"{EVENT_ICONS[action]} `{count}`" for action, count in counts.items()), inline=False)
+    firing = [label for kind, label in (("crash_loop", "crash loop"), ("flapping", "health flapping"))
+              if getattr(event_timeline.detectors.get((container_name, kind)), "firing", False)]
+    if firing:
+        embed.add_field(name="🚨 Active", value=", ".join(firing), inline=False)
+    embed.set_footer(text=get_current_time())
+    await ctx.respond(embed=embed)
+
 async def alert_monitor():
     await bot.wait_until_ready()
     alert_channel = bot.get_channel(ALERT_CHANNEL_ID)
@@ -689,56 +4360,71 @@ async def alert_monitor():
 
     print(f"✅ Monitoring containers... Alerts will be sent to #{alert_channel.name}")
 
+    samples_queue = stats_collector.subscribe()
+
     while not bot.is_closed():
         try:
-            stats_output = subprocess.check_output(
-                ["docker", "stats", "--no-stream", "--format", "{{.Name}} {{.CPUPerc}} {{.MemUsage}}"],
-                text=True
-            ).strip().split("\n")
-
-            for stat in stats_output:
-                parts = stat.split()
-                if len(parts) < 3:
-                    continue
+            samples = await samples_queue.get()
 
-                container_name, cpu_usage, mem_usage = parts[0], parts[1].strip('%'), parts[2]
+            for alert in alert_engine.evaluate(samples):
+                rule, stats = alert["rule"], alert["sample"]
+                container_name = stats["name"]
+                cpu_usage = round(stats["cpu_percent"], 2)
+                mem_usage = f"{format_binary_bytes(stats['mem_usage'])} / {format_binary_bytes(stats['mem_limit'])}"
+                label, value = rule.format(alert["value"])
+                _, threshold = rule.format(rule.clear_below if alert["resolved"] else rule.above)
 
-                try:
-                    cpu_usage = float(cpu_usage)
-                except ValueError:
-                    continue
+                embed = discord.Embed(
+                    title=f"✅ **Resolved {rule.name}: `{container_name}`**" if alert["resolved"] else f"🚨 **{rule.name}: `{container_name}`**",
+                    description=f"📈 **{label}:** `{value}` ({'below' if alert['resolved'] else 'above'} `{threshold}`)\n"
+                                f"🔥 **CPU Usage:** `{cpu_usage}%`\n🖥️ **Memory Usage:** `{mem_usage}`",
+                    color=discord.Colour.green() if alert["resolved"] else discord.Colour.red()
+                )
+                embed.set_footer(text=get_current_time())
 
-                if cpu_usage > ALERT_THRESHOLD:
-                    last_alert_time = alerted_containers.get(container_name)
-                    
-                    if last_alert_time and (datetime.now() - last_alert_time).seconds < 300:
-                        continue
+                outbound.send(alert_channel, embed=embed, priority=PRIORITY_ALERT)
 
-                    embed = discord.Embed(
-                        title=f"🚨 **High CPU Alert: `{container_name}`**",
-                        description=f"🔥 **CPU Usage:** `{cpu_usage}%`\n🖥️ **Memory Usage:** `{mem_usage}`",
-                        color=discord.Colour.red()
-                    )
-                    embed.set_footer(text=get_current_time())
-                    
-                    await alert_channel.send(embed=embed)
-                    alerted_containers[container_name] = datetime.now()
+        except Exception as e:
+            print(f"❌ Error evaluating alert rules: {e}")
 
-                elif container_name in alerted_containers:
-                    del alerted_containers[container_name]
+@bot.slash_command(description="Ping the bot.")
+async def ping(ctx):
+    queue = outbound.stats()
+    await ctx.respond(f"`🏓 Pong!` · Outbound queue: `{queue['depth']}` · Dropped: `{queue['dropped']}` · 429s: `{queue['rate_limited']}`")
 
-        except subprocess.CalledProcessError as e:
-            print(f"❌ Error fetching container stats: {e}")
+profile_lock = asyncio.Lock()
 
-        await asyncio.sleep(60)
+@bot.slash_command(description="Profile the bot's event loop and upload a collapsed-stack file (Admins only).")
+async def profile(ctx, seconds: discord.Option(int, description=f"How long to sample (1-{PROFILE_MAX_SECONDS})", min_value=1, max_value=PROFILE_MAX_SECONDS) = 10):
+    if not authorization.is_admin(ctx.author.id):
+        await ctx.respond("❌ Only Admins can use this command.")
+        return
+    if profile_lock.locked():
+        await ctx.respond("⚠️ A profile is already running. Please try again when it finishes.", ephemeral=True)
+        return
 
-@bot.slash_command(description="Ping the bot.")
-async def ping(ctx):
-    await ctx.respond(f"`🏓 Pong!`")
+    log_command(ctx.author.id, ctx.author.name, "profile", {"seconds": seconds})
+
+    async with profile_lock:
+        await ctx.defer()
+        # The sampler runs in a worker thread and inspects this (the event loop's) thread
+        stacks = await asyncio.to_thread(sample_stacks, threading.get_ident(), seconds)
+        samples = sum(stacks.values())
+        body = "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
+
+        embed = discord.Embed(
+            title="**__Event Loop Profile__**",
+            description=f"Collected `{samples}` samples over `{seconds}s` ({len(stacks)} unique stacks).\n"
+                        f"Open the file with speedscope or `flamegraph.pl`.",
+            color=discord.Colour.blurple(),
+        )
+        embed.set_footer(text=get_current_time())
+        filename = f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.collapsed"
+        await ctx.respond(embed=embed, file=discord.File(io.BytesIO(body.encode()), filename=filename))
 
 @bot.slash_command(description="Get system uptime.")
 async def uptime(ctx):
-    if ctx.author.id not in config["allowed_user_ids"]:
+    if not authorization.is_allowed(ctx.author.id):
         await ctx.respond("You are not authorized to use this bot.")
         return
 
@@ -747,9 +4433,9 @@ async def uptime(ctx):
     try:
         await ctx.defer()
         if platform.system().lower() == 'linux':
-            result = subprocess.check_output(['uptime', '-p'], text=True)
+            result = await asyncio.to_thread(subprocess.check_output, ['uptime', '-p'], text=True)
         elif platform.system().lower() == 'darwin':
-            result = subprocess.check_output(['uptime'], text=True)
+            result = await asyncio.to_thread(subprocess.check_output, ['uptime'], text=True)
         else:
             result = "System uptime command not supported on this platform."
 
@@ -764,9 +4450,62 @@ async def uptime(ctx):
     except subprocess.CalledProcessError as e:
         await ctx.respond(f"Error retrieving system uptime: {e}")
 
+class AuditPages(discord.ui.View):
+    """Newer/Older buttons paging through audit entries, one indexed query per page."""
+
+    def __init__(self, user_id, timeframe, since):
+        super().__init__(timeout=300)
+        self.user_id = user_id
+        self.timeframe = timeframe
+        self.since = since
+        self.cursors = [None]  # Row id each visited page starts before
+        self.rows = []
+        self.total = 0
+
+    async def load(self):
+        # One row past the page tells whether an older page exists
+        rows = await audit_store.page(self.since, self.cursors[-1], AUDIT_PAGE_SIZE + 1)
+        self.rows = rows[:AUDIT_PAGE_SIZE]
+        if len(self.cursors) == 1:
+            self.total = await audit_store.count(self.since)
+        self.newer.disabled = len(self.cursors) == 1
+        self.older.disabled = len(rows) <= AUDIT_PAGE_SIZE
+        return bool(self.rows)
+
+    def embed(self):
+        formatted_entries = [
+            f"**{username}** (`{user_id}`) executed `/{command}` with args `{args}` at `{datetime.fromtimestamp(timestamp).isoformat(timespec='seconds')}`"
+            for _, timestamp, user_id, username, command, args in self.rows
+        ]
+        embed = discord.Embed(
+            title=f"📜 Audit Log (Last {self.timeframe})",
+            description="\n".join(formatted_entries)[:4096],
+            color=discord.Colour.blue()
+        )
+        page = len(self.cursors)
+        pages = max((self.total + AUDIT_PAGE_SIZE - 1) // AUDIT_PAGE_SIZE, 1)
+        embed.set_footer(text=f"Page {page}/{pages} · {self.total} entries · {get_current_time()}")
+        return embed
+
+    async def interaction_check(self, interaction):
+        return interaction.user.id == self.user_id
+
+    @discord.ui.button(label="◀ Newer", style=discord.ButtonStyle.secondary)
+    async def newer(self, button, interaction):
+        self.cursors.pop()
+        await self.load()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @discord.ui.button(label="Older ▶", style=discord.ButtonStyle.secondary)
+    async def older(self, button, interaction):
+        self.cursors.append(self.rows[-1][0])
+        await self.load()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+
 @bot.slash_command(description="Audit command executions within a specified timeframe.")
 async def audit(ctx, timeframe: discord.Option(str, description="Specify timeframe (e.g., 10m for minutes, 2h for hours, 1d for days, 1mon for months)")):
-    if ctx.author.id not in config["allowed_user_ids"]:
+    if not authorization.is_allowed(ctx.author.id):
         await ctx.respond("You are not authorized to use this bot.")
         return
 
@@ -778,56 +4517,29 @@ async def audit(ctx, timeframe: discord.Option(str, description="Specify timefra
             await ctx.respond("Invalid timeframe format. Use 'm' for minutes, 'h' for hours, 'd' for days, or 'mon' for months (e.g., '15m', '2h', '1d', '1mon').")
             return
 
-        time_value = timeframe[:-1]
+        time_value = timeframe[:-3] if timeframe.endswith('mon') else timeframe[:-1]
         if not time_value.isdigit():
             await ctx.respond("Timeframe should be a number followed by 'm', 'h', 'd', or 'mon' (e.g., '10m', '2h', '1d', '1mon').")
             return
 
         # Calculate the cutoff time
-        now = datetime.now()
-        if timeframe.endswith('m'):
-            cutoff_time = now - timedelta(minutes=int(time_value))
-        elif timeframe.endswith('h'):
-            cutoff_time = now - timedelta(hours=int(time_value))
-        elif timeframe.endswith('d'):
-            cutoff_time = now - timedelta(days=int(time_value))
-        elif timeframe.endswith('mon'):
-            cutoff_time = now - timedelta(days=int(time_value) * 30)
-
-        # Read and filter the audit log
-        audit_entries = []
-        try:
-            with open(AUDIT_LOG_FILE, "r") as log_file:
-                for line in log_file:
-                    entry = json.loads(line)
-                    entry_time = datetime.fromisoformat(entry["timestamp"])
-                    if entry_time >= cutoff_time:
-                        audit_entries.append(entry)
-        except FileNotFoundError:
-            await ctx.respond("No audit logs found.")
-            return
+        units = {"mon": 30 * 86400, "m": 60, "h": 3600, "d": 86400}
+        unit = "mon" if timeframe.endswith("mon") else timeframe[-1]
+        cutoff_time = time.time() - int(timeframe[:-len(unit)]) * units[unit]
 
-        if not audit_entries:
+        view = AuditPages(ctx.author.id, timeframe, cutoff_time)
+        if not await view.load():
             await ctx.respond(f"No commands executed in the last {timeframe}.")
             return
 
-        # Format the audit log entries
-        formatted_entries = []
-        for entry in audit_entries:
-            formatted_entries.append(
-                f"**{entry['username']}** (`{entry['user_id']}`) executed `/{entry['command']}` with args `{entry['args']}` at `{entry['timestamp']}`"
-            )
-
-        # Create embed for the response
-        embed = discord.Embed(
-            title=f"📜 Audit Log (Last {timeframe})",
-            description="\n".join(formatted_entries),
-            color=discord.Colour.blue()
-        )
-        embed.set_footer(text=get_current_time())
-        await ctx.respond(embed=embed)
+        await ctx.respond(embed=view.embed(), view=view)
 
     except Exception as e:
         await ctx.respond(f"⚠️ Error fetching audit logs: {e}")
 
-bot.run(config["token"])
\ No newline at end of file
+if __name__ == "__main__":
+    try:
+        bot.run(config["token"])
+    finally:
+        # bot.run returns once SIGINT/SIGTERM stopped the loop; keep the last second of audit entries
+        audit_store.close()